@@ -0,0 +1,187 @@
+# Alarm analytics: Pareto, frequency and MTBF/MTTR per alarm code.
+#
+# Alarm codes are numbered per workcell; data/alarm_code.xlsx has one sheet
+# per workcell mapping each code to its Chinese and English text. The
+# dictionary is loaded once per DataStore as a categorical lookup and joined
+# to the alarm facts with a single index lookup.
+#
+# The exports have no alarm start/stop times, only daily counts per code, so
+# repair and operating time are estimated per (workcell, day): the day's
+# 'alarming' time from the downtime breakdown is shared out over its alarms in
+# proportion to their count (MTTR), and the output hours minus the day's
+# downtime is the operating time between them (MTBF).
+
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import dash_table, dcc, html
+from dash.dependencies import Input, Output
+from plotly.subplots import make_subplots
+
+import controls
+import ingest
+import metrics
+import tables
+
+CODES_FILE = 'alarm_code.xlsx'
+TOP_N = 10
+SUMMARY_COLUMNS = ['workcell', 'alarm_code', 'description', 'count', 'days', 'per_day', 'share',
+                   'cumulative_share', 'mttr_seconds', 'mtbf_seconds']
+
+
+def codes_path(data_dir=ingest.DATA_DIR):
+    return os.path.join(data_dir, CODES_FILE)
+
+
+class AlarmCodes:
+    """Alarm code dictionary indexed by (workcell, code), with categorical descriptions."""
+
+    def __init__(self, sheets=None, version=''):
+        self.version = version
+        frames = []
+        for name, df in (sheets or {}).items():
+            if str(name).isdigit() and len(df.columns) >= 6:
+                frames.append(pd.DataFrame({
+                    'workcell': int(name),
+                    'alarm_code': pd.to_numeric(df.iloc[:, 2], errors='coerce'),
+                    'description': df.iloc[:, 5],
+                    'description_zh': df.iloc[:, 1],
+                }))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['workcell', 'alarm_code', 'description', 'description_zh'])
+        # A few sheets list a code twice; the first entry wins
+        df = df.dropna(subset=['alarm_code']).drop_duplicates(['workcell', 'alarm_code'])
+        # Entries with neither text are left out, so the export's text is used
+        df = df[df['description'].notna() | df['description_zh'].notna()]
+        description = df['description'].where(df['description'].notna(), df['description_zh']).astype(str)
+        self.index = pd.MultiIndex.from_arrays([df['workcell'].astype(np.int64), df['alarm_code'].astype(np.int64)])
+        self.descriptions = description.astype('category')
+        self.categories = self.descriptions.cat.categories
+        self.lookup = self.descriptions.cat.codes.to_numpy()
+
+    @classmethod
+    def load(cls, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+        path = codes_path(data_dir)
+        if not os.path.exists(path):
+            return cls()
+        sheets = ingest.load_workbook(path, data_dir, cache_dir)
+        return cls(sheets, ingest.manifest(path, data_dir, cache_dir)['sha1'][:12])
+
+    def describe(self, workcell, alarm_code, fallback=None):
+        """Categorical description for each (workcell, code) pair.
+
+        With ``fallback`` (the export's alarm text), codes missing from the
+        dictionary get that text instead, and ``Code <n>`` when it is empty too.
+        """
+        alarm_code = np.asarray(alarm_code, dtype=np.int64)
+        position = self.index.get_indexer(pd.MultiIndex.from_arrays([np.asarray(workcell, dtype=np.int64), alarm_code]))
+        codes = np.where(position >= 0, self.lookup[np.maximum(position, 0)] if len(self.lookup) else -1, -1)
+        result = pd.Categorical.from_codes(codes, self.categories)
+        if fallback is None:
+            return result
+        fallback = pd.Series(np.asarray(fallback, dtype=object))
+        fallback = fallback.where(fallback.notna() & (fallback.astype(str).str.strip() != ''),
+                                  pd.Series([f'Code {c}' for c in alarm_code], dtype=object))
+        return pd.Series(result).astype(object).where(codes >= 0, fallback)
+
+
+def summary(store, line, start, end, workcell=None):
+    """Per (workcell, alarm code) counts and estimated MTTR/MTBF over a date range, most frequent first."""
+    workcells = None if workcell is None else [workcell]
+    alarm = store.facts['alarm'].select([line], workcells, start, end).to_pandas()
+    if alarm.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    breakdown = store.facts['downtime_breakdown'].select([line], workcells, start, end).to_pandas()
+    hourly = store.facts['hourly_downtime'].select([line], workcells, start, end).to_pandas()
+    output = store.facts['output'].select([line], workcells, start, end).to_pandas()
+
+    day = ['workcell', 'date']
+    days = pd.DataFrame({
+        'alarms': alarm.groupby(day)['count'].sum(),
+        'alarming_seconds': breakdown[breakdown['WORKCELL_STATUS'] == 'alarming'].groupby(day)['total_seconds'].sum(),
+        'downtime_seconds': hourly.groupby(day)['Total_seconds'].sum(),
+        'hours': output.groupby(day).size(),
+    }).fillna(0)
+    days['operating_seconds'] = (days['hours'] * 3600 - days['downtime_seconds']).clip(lower=0)
+
+    alarm = alarm.join(days[['alarms', 'alarming_seconds']], on=day)
+    alarm['repair_seconds'] = alarm['alarming_seconds'] * alarm['count'] / alarm['alarms'].where(alarm['alarms'] > 0)
+    operating = days.groupby(level='workcell')['operating_seconds'].sum()
+
+    df = alarm.groupby(['workcell', 'alarm_code'], as_index=False).agg(
+        count=('count', 'sum'),
+        days=('date', 'nunique'),
+        repair_seconds=('repair_seconds', 'sum'),
+        text=('alarm', 'first'),
+    )
+    df = df.sort_values(['count', 'workcell', 'alarm_code'], ascending=[False, True, True], ignore_index=True)
+    total_days = alarm['date'].nunique()
+    df['description'] = store.alarm_codes.describe(df['workcell'], df['alarm_code'], fallback=df['text'])
+    df['per_day'] = df['count'] / total_days
+    df['share'] = df['count'] / df['count'].sum()
+    df['cumulative_share'] = df['share'].cumsum()
+    df['mttr_seconds'] = np.round(df['repair_seconds'] / df['count'], 0)
+    df['mtbf_seconds'] = np.round(df['workcell'].map(operating) / df['count'], 0)
+    return df[SUMMARY_COLUMNS]
+
+
+def pareto_figure(records, top_n=TOP_N):
+    top = records[:top_n]
+    labels = [f"WC{r['workcell']} #{r['alarm_code']}" for r in top]
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(go.Bar(x=labels, y=[r['count'] for r in top], name="Count",
+                         hovertext=[r['description'] for r in top]), secondary_y=False)
+    fig.add_trace(go.Scatter(x=labels, y=[r['cumulative_share'] for r in top], name="Cumulative share",
+                             mode='lines+markers'), secondary_y=True)
+    fig.update_layout(title_text=f"Top {len(top)} alarms")
+    fig.update_yaxes(title_text="<b>Count</b>", secondary_y=False)
+    fig.update_yaxes(title_text="Cumulative share", tickformat='.0%', range=[0, 1.05], secondary_y=True)
+    return fig
+
+
+def layout(store):
+    return html.Div(children=[
+        controls.controls('alarm', store, controls.labelled('Top N', dcc.Input(
+            id="alarm_top_n",
+            type='number',
+            min=1,
+            max=50,
+            value=TOP_N,
+            style={"marginTop": '10px', "display": 'block'}
+        ))),
+
+        dcc.Graph(id="alarm_pareto"),
+
+        dash_table.DataTable(
+            id='alarm_summary_table',
+            columns=tables.columns(SUMMARY_COLUMNS),
+            page_size=20,
+        ),
+    ])
+
+
+def register(app, get_store, results):
+    """Add the alarm analytics callbacks; results is the app's ResultCache."""
+
+    # Cached per (line, range, workcell); the top-N cut is applied afterwards
+    # so changing it never recomputes the summary
+    @results.memoize(version=lambda line, start, end, workcell: (get_store().version(line), get_store().alarm_codes.version))
+    def summary_records(line, start, end, workcell):
+        with metrics.phase('slice'):
+            return summary(get_store(), line, start, end, workcell).to_dict('records')
+
+    @app.callback(
+        Output(component_id='alarm_pareto', component_property='figure'),
+        Output(component_id='alarm_summary_table', component_property='data'),
+        Input(component_id='alarm_range', component_property='start_date'),
+        Input(component_id='alarm_range', component_property='end_date'),
+        Input(component_id='alarm_line', component_property='value'),
+        Input(component_id='alarm_workcell', component_property='value'),
+        Input(component_id='alarm_top_n', component_property='value')
+    )
+    def update_alarm_analytics(start_date, end_date, line, workcell, top_n):
+        start, end, workcell = controls.selected(start_date, end_date, workcell)
+        records = summary_records(line, start, end, workcell)
+        with metrics.phase('figure'):
+            return pareto_figure(records, top_n or TOP_N), records
@@ -1,166 +1,242 @@
 # Run this app with `python app.py` and
 # visit http://127.0.0.1:8050/ in your web browser.
 
+import functools
 import os
-import re
-from glob import glob
+import threading
 
 import dash
-import numpy as np
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from dash import dash_table, dcc, html
-from dash.dependencies import Input, Output
-from plotly.subplots import make_subplots
-
-app = dash.Dash(__name__)
+from dash.dependencies import ClientsideFunction, Input, Output, State
+
+import alarms
+import downsample
+import export
+import facts
+import figures
+import loading
+import metrics
+import oee
+import overview
+import snapshots
+import tables
+import trends
+import watcher
+from results import ResultCache
+from store import LINE_KINDS, DataStore
+
+# The dashboard's components only exist once the data is loaded
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
 
+# Render the figures and tables in the browser from one bundle per (line, date)
+CLIENTSIDE = os.environ.get('POD_CLIENTSIDE') == '1'
+
+# data_workcell is 0-based and callbacks add one, so this selects the
+# line-level data stored as workcell facts.LINE
+LINE_WORKCELL = facts.LINE - 1
+
 colors = {
     'background': '#111111',
     'text': '#7FDBFF'
 }
 
-# assume you have a "long-form" data frame
-# see https://plotly.com/python/px-arguments/ for more options
-output_files_name = [y for x in os.walk('./data/output') for y in glob(os.path.join(x[0], '*.xlsx'))]
-downtime_files_name = [y for x in os.walk('./data/downtime') for y in glob(os.path.join(x[0], '*.xlsx'))]
-alarm_files_name = [y for x in os.walk('./data/alarm') for y in glob(os.path.join(x[0], '*.xlsx'))]
-
-output_lines_name = [re.search('L.{1}', name).group(0) for name in output_files_name]
-downtime_lines_name = [re.search('L.{1}', name).group(0) for name in downtime_files_name]
-alarm_lines_name = [re.search('L.{1}', name).group(0) for name in alarm_files_name]
-print(output_lines_name)
-# Get output data from excel file
-output_df = {}
-for x in output_files_name:
-    arr = []
-    for y in range(10):
-        arr.append(pd.read_excel(x, sheet_name=y, parse_dates=["Createtime"], index_col="Createtime"))
-    line_name = re.search('L.{1}', x).group(0)
-    output_df[line_name] = arr
-
-
-# Get downtime data from excel file
-downtime_df = {}
-for x in downtime_files_name:
-    xl = pd.ExcelFile(x)
-    res = len(xl.sheet_names)
-    arr = []
-    for y in range(res):
-        arr.append(pd.read_excel(x, sheet_name=y))
-    downtime_line_name = re.search('L.{1}', x).group(0)
-    downtime_df[downtime_line_name] = arr
-
-
-# Get alarm data from excel file
-alarm_df = {}
-for x in alarm_files_name:
-    xl = pd.ExcelFile(x)
-    res = len(xl.sheet_names)
-    date_dict = {}
-    for y in range(res):
-        temp = pd.read_excel(x, sheet_name=y)
-        date = temp["Date"][0]
-        date_dict[date] = temp.drop(["Unnamed: 0"], axis=1)
-    alarm_line_name = re.search('L.{1}', x).group(0)
-    alarm_df[alarm_line_name] = date_dict
-
-# Format the downtime data for plot
-downtime_date_dict = {}
-for l in downtime_lines_name:
-    temp = {}
-    downtime_df_copy = downtime_df[l].copy()
-    line_date_arr = [x.loc[0]["Createtime"] for x in downtime_df_copy[::3]]
-    for d in line_date_arr:
-        sub_temp = {}
-        for v in range(3):
-            temp_df = downtime_df_copy.pop(0)
-            temp_df = temp_df.fillna(0)
-            if 'Createtime' in temp_df.keys():
-                temp_df.set_index('Createtime', inplace=True)
-                temp_df["Total_minutes"] = np.round(temp_df["Total_seconds"] /60, 0)
-                sub_temp["hourly_downtime"] = temp_df
-                
-            elif 'WORKCELL_STATUS' in temp_df.keys():
-                temp_df.set_index('WORKCELL_STATUS', inplace=True)
-                sub_temp["downtime_breakdown"] = temp_df
-
-            else:
-                sub_temp["downtime"] = temp_df
-        temp[d.strftime("%Y-%m-%d")] = sub_temp
-    downtime_date_dict[l] = temp
-
-
-date_arr = list(set([x.date() for x in output_df[output_lines_name[0]][0].index]))
-date_arr.sort()
-date_str_arr = [d.strftime("%Y-%m-%d")  for d in date_arr]
-# alarn_date_str = [d.strftime("%m/%d/%Y")  for d in date_arr]
-
-
-# Setup default data for figure
-default_output_df = output_df[output_lines_name[0]][0].loc[date_str_arr[0]]
-default_downtime_df = downtime_date_dict[downtime_lines_name[0]][date_str_arr[0]]['downtime']
-default_downtime_breakdown_df = downtime_date_dict[downtime_lines_name[0]][date_str_arr[0]]['downtime_breakdown']['wc1']
-default_hourly_downtime_df = downtime_date_dict[downtime_lines_name[0]][date_str_arr[0]]["hourly_downtime"][downtime_date_dict[downtime_lines_name[0]][date_str_arr[0]]["hourly_downtime"]['WORKCELL'] == 1]
-default_breakdown_pie_df = pd.DataFrame(default_downtime_breakdown_df)
-default_breakdown_pie_df['wc1'] = pd.to_timedelta(default_breakdown_pie_df["wc1"])
-default_breakdown_pie_df["total_seconds"] = default_breakdown_pie_df["wc1"].dt.total_seconds()
-default_alarm_df = alarm_df[alarm_lines_name[0]][date_str_arr[0]]
-
-
-# Create figure for the data
-# output_fig = px.bar(default_output_df, y="HourlyOutput", text='HourlyOutput')
-# downtime_fig = px.line(default_hourly_downtime_df, x=default_hourly_downtime_df.index, y='Total_minutes')
-downtime_fig_pie = px.pie(default_breakdown_pie_df, values='total_seconds', names=default_breakdown_pie_df.index)
-alarm_fig = px.bar(default_alarm_df[default_alarm_df["WORKCELL"] == 1], y='count', color="alarm_code", text="alarm_code")
-
-make_float = lambda x: "{:,.2f}%".format(x*100)
-
-output_data_table_df = output_df[output_lines_name[0]][0].loc[date_str_arr[0]].copy()
-output_data_table_df.reset_index(inplace=True)
-output_data_table_df['NGRate'] = output_data_table_df['NGRate'].apply(make_float)
-output_data_table_df['Yield'] = output_data_table_df['Yield'].apply(make_float)
-output_data_table_df['YieldWithoutSample'] = output_data_table_df['YieldWithoutSample'].apply(make_float)
-output_data_table_df = output_data_table_df.rename(columns = {'index':'new column name'})
-
-downtime_data_table_df = default_breakdown_pie_df.copy()
-downtime_data_table_df = default_breakdown_pie_df.rename({'wc1': 'total_time'}, axis=1)
-downtime_data_table_df['total_time'] = downtime_data_table_df['total_time'].astype(str)
-downtime_data_table_df.reset_index(inplace=True)
-downtime_data_table_df = downtime_data_table_df.rename(columns = {'index':'new column name'})
-
-alarm_data_table_df = alarm_df[alarm_lines_name[0]][date_str_arr[0]][alarm_df[alarm_lines_name[0]][date_str_arr[0]]["WORKCELL"] == 1].copy()
-
-
-# Create figure with output and downtime
-mul_fig = make_subplots(specs=[[{"secondary_y": True}]])
-# Add traces
-mul_fig.add_trace(
-    go.Bar(x=default_output_df.index, y=default_output_df["HourlyOutput"], name="Hourly output"),
-    secondary_y=False,
-)
-
-mul_fig.add_trace(
-    go.Scatter(x=default_hourly_downtime_df.index, y=default_hourly_downtime_df['Total_minutes'], name="Downtime in minutes"),
-    secondary_y=True,
-)
-
-# Add mul_figure title
-mul_fig.update_layout(
-    title_text="Hourly output and downtime in minutes"
-)
-
-# Set x-axis title
-mul_fig.update_xaxes(title_text="Createtime")
-
-# Set y-axes titles
-mul_fig.update_yaxes(title_text="<b>Output</b>", secondary_y=False)
-mul_fig.update_yaxes(title_text="<b>Downtime</b> in minutes", secondary_y=True)
-
-
-app.layout = html.Div(children=[
+# The store is built in a background thread (see loading.py) so the server
+# answers straight away; until it is ready the page shows the loading view.
+# Frames are loaded per (line, date) on first use, see store.py
+store = None
+results = ResultCache()
+# Closed days are served from pre-rendered snapshots, see snapshots.py
+snapshot_store = snapshots.SnapshotStore()
+# Preloaded into the gunicorn master the store has to be ready before the
+# fork, as the loader thread would not survive it
+PRELOAD = os.environ.get('POD_PRELOAD') == '1'
+
+
+def set_store(new_store):
+    # Requests keep using the old store until this single assignment swaps
+    # the new one in
+    global store
+    store = new_store
+    print(store.lines)
+    if snapshots.ENABLED:
+        threading.Thread(target=snapshots.warm, args=(new_store,), name='pod-snapshots', daemon=True).start()
+
+
+def reload_store():
+    # Called from the watcher thread
+    set_store(DataStore())
+
+
+loader = loading.Loader(lambda progress: DataStore(progress=progress), set_store)
+if PRELOAD:
+    loader.run()
+else:
+    loader.start()
+
+watcher.install(server, reload_store, lambda: store.snapshot if store is not None else None)
+metrics.install(server)
+loading.install(server, loader.ready.is_set, loader.describe)
+
+
+@functools.lru_cache(maxsize=1)
+def main_view(store):
+    # Built once per store and reused for every page load
+    output_lines_name = store.lines
+    date_str_arr = store.dates
+
+    # Setup default data for figure
+    default_output_df = store.slice('output', output_lines_name[0], 1, date_str_arr[0])
+    default_breakdown_pie_df = store.slice('downtime_breakdown', output_lines_name[0], 1, date_str_arr[0])
+    default_hourly_downtime_df = store.slice('hourly_downtime', output_lines_name[0], 1, date_str_arr[0])
+    default_alarm_df = store.slice('alarm', output_lines_name[0], 1, date_str_arr[0])
+
+    # Create figure for the data; callbacks only patch their traces afterwards
+    mul_fig = figures.output_downtime_figure(figures.output_downtime_traces(default_output_df, default_hourly_downtime_df))
+    downtime_fig_pie = figures.breakdown_figure(default_breakdown_pie_df)
+    alarm_fig = figures.alarm_figure(default_alarm_df)
+
+    output_table_records = store.records('output', output_lines_name[0], 1, date_str_arr[0])
+    downtime_table_records = store.records('downtime_breakdown', output_lines_name[0], 1, date_str_arr[0])
+    alarm_table_records = store.records('alarm', output_lines_name[0], 1, date_str_arr[0])
+
+    return [
+        dcc.Interval(
+            id="reload_interval",
+            interval=max(watcher.INTERVAL, 1) * 1000,
+            disabled=watcher.INTERVAL <= 0
+        ),
+
+        dcc.Store(id="line_bundle"),
+
+        dcc.Tabs(children=[
+            dcc.Tab(label='Daily detail', children=[
+                html.Div(
+                    children=[
+                        html.Div(
+                            children=[
+                                html.Label('Date'),
+                                dcc.Dropdown(
+                                    id="data_date",
+                                    options=[{"label": f"{i}", "value": i} for i in date_str_arr],
+                                    value=date_str_arr[0],
+                                    style={"marginTop": '10px'}
+                                )
+                            ],
+                            style={"width": '100%', "padding": '10px'}
+                        ),
+
+                        html.Div(
+                            children=[
+                                html.Label('Line Number'),
+                                dcc.Dropdown(
+                                    id="data_line",
+                                    options=[{"label": i, "value": i} for i in output_lines_name],
+                                    value=output_lines_name[0],
+                                    style={"marginTop": '10px'}
+                                )
+                            ],
+                            style={"width": '100%', "padding": '10px'}
+                        ),
+
+                        html.Div(
+                            children=[
+                                html.Label('Workcell Number'),
+                                dcc.Dropdown(
+                                    id="data_workcell",
+                                    options=[{"label": "Whole line", "value": LINE_WORKCELL}]
+                                    + [{"label": f"Workcell {i + 1}", "value": i} for i in range(10)],
+                                    value=0,
+                                    style={"marginTop": '10px'}
+                                )
+                            ],
+                            style={"width": '100%', "padding": '10px'}
+                        ),
+                    ],
+                    style={'display': 'flex', 'justifyContent': 'space-between'}
+                ),
+
+                html.Div(id="export_links", style={"padding": '10px'}),
+
+                dcc.Graph(id="output_downtime_graph", figure=mul_fig),
+
+                html.H2(
+                    children='Table Details',
+                    style={
+                    'textAlign': 'center',
+                    'color': colors['text']
+                }),
+
+                dash_table.DataTable(
+                    id='data_table',
+                    columns=tables.columns(store.columns('output', output_lines_name[0], 1, date_str_arr[0]).keys()),
+                    data=output_table_records,
+                    **tables.actions(custom=not CLIENTSIDE),
+                ),
+
+                html.H2(
+                    children='Downtime',
+                    style={
+                    'textAlign': 'center',
+                    'color': colors['text']
+                }),
+
+                dash_table.DataTable(
+                    id='downtime_table',
+                    columns=tables.columns(store.columns('downtime_breakdown', output_lines_name[0], 1, date_str_arr[0]).keys()),
+                    data=downtime_table_records,
+                    **tables.actions(custom=not CLIENTSIDE),
+                ),
+                dcc.Graph(
+                    id='downtime_breakdown',
+                    figure=downtime_fig_pie
+                ),
+
+                dcc.Graph(
+                    id='alarm',
+                    figure=alarm_fig
+                ),
+                dash_table.DataTable(
+                    id='alarm_data_table',
+                    columns=tables.columns(store.columns('alarm', output_lines_name[0], 1, date_str_arr[0]).keys()),
+                    data=alarm_table_records,
+                    **tables.actions(custom=not CLIENTSIDE),
+                ),
+            ]),
+
+            dcc.Tab(label='Trends', children=[
+                trends.layout(store),
+            ]),
+
+            dcc.Tab(label='Alarm analytics', children=[
+                alarms.layout(store),
+            ]),
+
+            dcc.Tab(label='Plant overview', children=[
+                overview.layout(store),
+            ]),
+
+            dcc.Tab(label='OEE', children=[
+                oee.layout(store),
+            ]),
+        ]),
+    ]
+
+
+def loading_view():
+    return [
+        html.P(
+            id="loading_progress",
+            children=f"Loading data: {loader.describe()}",
+            style={'textAlign': 'center'}
+        ),
+        dcc.Interval(id="loading_interval", interval=1000),
+    ]
+
+
+def serve_layout():
+    # Called on every page load, so a page opened after loading gets the data
+    return html.Div(children=[
     html.H1(
         children='POD Automation Line Data Analysis',
         style={
@@ -168,169 +244,233 @@ app.layout = html.Div(children=[
         'color': colors['text']
     }),
 
-    html.Div(
-        children=[
-            html.Div(
-                children=[
-                    html.Label('Date'),
-                    dcc.Dropdown(
-                        id="data_date",
-                        options=[{"label": f"{i}", "value": i} for i in date_str_arr],
-                        value=date_str_arr[0],
-                        style={"marginTop": '10px'}
-                    )
-                ],
-                style={"width": '100%', "padding": '10px'}
-            ),
-
-            html.Div(
-                children=[
-                    html.Label('Line Number'),
-                    dcc.Dropdown(
-                        id="data_line",
-                        options=[{"label": i, "value": i} for i in output_lines_name],
-                        value=output_lines_name[0],
-                        style={"marginTop": '10px'}
-                    )
-                ],
-                style={"width": '100%', "padding": '10px'}
-            ),
-
-            html.Div(
-                children=[
-                    html.Label('Workcell Number'),
-                    dcc.Dropdown(
-                        id="data_workcell",
-                        options=[{"label": f"Workcell {i + 1}", "value": i} for i in range(10)],
-                        value=0,
-                        style={"marginTop": '10px'}
-                    )
-                ],
-                style={"width": '100%', "padding": '10px'}
-            ),
-        ],
-        style={'display': 'flex', 'justifyContent': 'space-between'}
-    ),
-
-    dcc.Graph(id="output_downtime_graph", figure=mul_fig),
-
-    html.H2(
-        children='Table Details',
-        style={
-        'textAlign': 'center',
-        'color': colors['text']
-    }),
+    html.Div(id="page", children=main_view(store) if store is not None else loading_view()),
+])
 
-    dash_table.DataTable(
-        id='data_table',
-        columns=[{"name": i, "id": i} for i in output_data_table_df.columns],
-        data=output_data_table_df.to_dict('records'),
-    ),
 
-    html.H2(
-        children='Downtime',
-        style={
-        'textAlign': 'center',
-        'color': colors['text']
-    }),
-    
-    dash_table.DataTable(
-        id='downtime_table',
-        columns=[{"name": i, "id": i} for i in downtime_data_table_df.columns],
-        data=downtime_data_table_df.to_dict('records'),
-    ),
-    dcc.Graph(
-        id='downtime_breakdown',
-        figure=downtime_fig_pie
-    ),
-
-    dcc.Graph(
-        id='alarm',
-        figure=alarm_fig
-    ),
-    dash_table.DataTable(
-        id='alarm_data_table',
-        columns=[{"name": i, "id": i} for i in alarm_data_table_df.columns],
-        data=alarm_data_table_df.to_dict('records'),
-    ),
+app.layout = serve_layout
 
-])
 
 @app.callback(
-    Output(component_id='output_downtime_graph', component_property='figure'),
-    Output(component_id='data_table', component_property='data'),
-    Output(component_id='downtime_breakdown', component_property='figure'),
-    Output(component_id='downtime_table', component_property='data'),
-    Output(component_id='alarm', component_property='figure'),
-    Output(component_id='alarm_data_table', component_property='data'),
+    Output(component_id='page', component_property='children'),
+    Output(component_id='loading_progress', component_property='children'),
+    Input(component_id='loading_interval', component_property='n_intervals'),
+    prevent_initial_call=True
+)
+def update_loading(n_intervals):
+    # Swap the dashboard in once the store is ready
+    if store is None:
+        return dash.no_update, f"Loading data: {loader.describe()}"
+    return main_view(store), dash.no_update
+
+# Every output has its own callback, so Dash can run them independently and
+# each one's result is cached on its own
+SELECTION = [
     Input(component_id='data_date', component_property='value'),
     Input(component_id='data_line', component_property='value'),
-    Input(component_id='data_workcell', component_property='value')
-)
-def update_output_graph(data_date, data_line, data_workcell):
-    print(data_date, data_line, data_workcell)
-
-    # Update Hourly output bar chart
-    # output_fig = px.bar(output_df[data_line][data_workcell].loc[data_date], y="HourlyOutput", text='HourlyOutput')
-
-    # Update output data table
-    output_data_table_df = output_df[data_line][data_workcell].loc[data_date].copy()
-    output_data_table_df.reset_index(inplace=True)
-    output_data_table_df['NGRate'] = output_data_table_df['NGRate'].apply(make_float)
-    output_data_table_df['Yield'] = output_data_table_df['Yield'].apply(make_float)
-    output_data_table_df['YieldWithoutSample'] = output_data_table_df['YieldWithoutSample'].apply(make_float)
-    output_data_table_df = output_data_table_df.rename(columns = {'index':'new column name'})
-
-    # Upddate pie chart
-    default_downtime_breakdown_df = downtime_date_dict[data_line][data_date]['downtime_breakdown'][f'wc{data_workcell + 1}']
-    default_breakdown_pie_df = pd.DataFrame(default_downtime_breakdown_df)
-    default_breakdown_pie_df[f'wc{data_workcell + 1}'] = pd.to_timedelta(default_breakdown_pie_df[f'wc{data_workcell + 1}'])
-    default_breakdown_pie_df["total_seconds"] = np.round(default_breakdown_pie_df[f'wc{data_workcell + 1}'].dt.total_seconds(), 0)
-    downtime_fig_pie = px.pie(default_breakdown_pie_df, values='total_seconds', names=default_breakdown_pie_df.index)
-
-    # Update downtime breakdown table
-    downtime_data_table_df = default_breakdown_pie_df.copy()
-    downtime_data_table_df = default_breakdown_pie_df.rename({f'wc{data_workcell + 1}': 'total_time'}, axis=1)
-    downtime_data_table_df['total_time'] = downtime_data_table_df['total_time'].astype(str)
-    downtime_data_table_df.reset_index(inplace=True)
-    downtime_data_table_df = downtime_data_table_df.rename(columns = {'index':'new column name'})
-
-    # Update Hourly downtime line chart
-    default_hourly_downtime_df = downtime_date_dict[data_line][data_date]["hourly_downtime"][downtime_date_dict[data_line][data_date]["hourly_downtime"]['WORKCELL'] == (data_workcell + 1)]
-    # downtime_fig = px.line(default_hourly_downtime_df, x=default_hourly_downtime_df.index, y='Total_minutes')
-
-    # Update Hourly output downtime figure
-    mul_fig = make_subplots(specs=[[{"secondary_y": True}]])
-    # Add traces
-    mul_fig.add_trace(
-        go.Bar(x=output_df[data_line][data_workcell].loc[data_date].index, y=output_df[data_line][data_workcell].loc[data_date]["HourlyOutput"], name="Hourly output", text=output_df[data_line][data_workcell].loc[data_date]["HourlyOutput"]),
-        secondary_y=False,
+    Input(component_id='data_workcell', component_property='value'),
+]
+memoize = results.memoize(version=lambda data_date, data_line, data_workcell: store.version(data_line))
+
+
+def snapshot(data_date, data_line, data_workcell):
+    # None for the current day, or while its snapshot is not written yet
+    if not snapshots.ENABLED:
+        return None
+    with metrics.phase('snapshot'):
+        return snapshot_store.get(store, data_line, data_date, data_workcell + 1)
+
+
+@memoize
+def output_downtime_traces(data_date, data_line, data_workcell):
+    cached = snapshot(data_date, data_line, data_workcell)
+    if cached is not None:
+        return cached['output_downtime_graph']
+    with metrics.phase('slice'):
+        output_df = store.slice('output', data_line, data_workcell + 1, data_date)
+        hourly_downtime_df = store.slice('hourly_downtime', data_line, data_workcell + 1, data_date)
+    with metrics.phase('figure'):
+        return figures.output_downtime_traces(output_df, hourly_downtime_df)
+
+
+@memoize
+def breakdown_traces(data_date, data_line, data_workcell):
+    cached = snapshot(data_date, data_line, data_workcell)
+    if cached is not None:
+        return cached['downtime_breakdown']
+    with metrics.phase('slice'):
+        breakdown_df = store.slice('downtime_breakdown', data_line, data_workcell + 1, data_date)
+    with metrics.phase('figure'):
+        return figures.breakdown_traces(breakdown_df)
+
+
+@memoize
+def alarm_traces(data_date, data_line, data_workcell):
+    cached = snapshot(data_date, data_line, data_workcell)
+    if cached is not None:
+        return cached['alarm']
+    with metrics.phase('slice'):
+        alarm_df = store.slice('alarm', data_line, data_workcell + 1, data_date)
+    with metrics.phase('figure'):
+        return figures.alarm_traces(alarm_df)
+
+
+def update_output_downtime_graph(data_date, data_line, data_workcell):
+    return figures.patch(output_downtime_traces(data_date, data_line, data_workcell))
+
+
+def update_output_table(data_date, data_line, data_workcell, page_current, page_size, sort_by, filter_query):
+    # Only the visible page is sent; records and sort orders are built once per slice
+    if snapshots.first_page(page_current, page_size, sort_by, filter_query):
+        cached = snapshot(data_date, data_line, data_workcell)
+        if cached is not None:
+            return cached['data_table']
+    with metrics.phase('table'):
+        return tables.page(store, 'output', data_line, data_workcell + 1, data_date, page_current, page_size, sort_by, filter_query)
+
+
+def update_output_table_columns(data_date, data_line, data_workcell):
+    # The whole line has its own columns, e.g. the consistency check
+    cached = snapshot(data_date, data_line, data_workcell)
+    if cached is not None:
+        return cached['data_table_columns']
+    with metrics.phase('table'):
+        return tables.columns(store.columns('output', data_line, data_workcell + 1, data_date).keys())
+
+
+def update_downtime_breakdown(data_date, data_line, data_workcell):
+    return figures.patch(breakdown_traces(data_date, data_line, data_workcell))
+
+
+def update_downtime_table(data_date, data_line, data_workcell, page_current, page_size, sort_by, filter_query):
+    if snapshots.first_page(page_current, page_size, sort_by, filter_query):
+        cached = snapshot(data_date, data_line, data_workcell)
+        if cached is not None:
+            return cached['downtime_table']
+    with metrics.phase('table'):
+        return tables.page(store, 'downtime_breakdown', data_line, data_workcell + 1, data_date, page_current, page_size, sort_by, filter_query)
+
+
+def update_alarm_graph(data_date, data_line, data_workcell):
+    return figures.patch(alarm_traces(data_date, data_line, data_workcell))
+
+
+def update_alarm_table(data_date, data_line, data_workcell, page_current, page_size, sort_by, filter_query):
+    if snapshots.first_page(page_current, page_size, sort_by, filter_query):
+        cached = snapshot(data_date, data_line, data_workcell)
+        if cached is not None:
+            return cached['alarm_data_table']
+    with metrics.phase('table'):
+        return tables.page(store, 'alarm', data_line, data_workcell + 1, data_date, page_current, page_size, sort_by, filter_query)
+
+
+SELECTION_OUTPUTS = [
+    ('output_downtime_graph', 'figure', update_output_downtime_graph),
+    ('data_table', 'data', update_output_table),
+    ('data_table', 'columns', update_output_table_columns),
+    ('downtime_breakdown', 'figure', update_downtime_breakdown),
+    ('downtime_table', 'data', update_downtime_table),
+    ('alarm', 'figure', update_alarm_graph),
+    ('alarm_data_table', 'data', update_alarm_table),
+]
+
+if CLIENTSIDE:
+    # The server only sends the (line, date) bundle; assets/clientside.js
+    # renders each output for the selected workcell in the browser
+    @app.callback(
+        Output(component_id='line_bundle', component_property='data'),
+        Input(component_id='data_date', component_property='value'),
+        Input(component_id='data_line', component_property='value')
     )
+    @results.memoize(version=lambda data_date, data_line: store.version(data_line))
+    def update_line_bundle(data_date, data_line):
+        bundle = store.bundle(data_line, data_date)
+        bundle['columns'] = {
+            'workcell': tables.columns(bundle['workcells'][0]['output'].keys()),
+            'line': tables.columns(bundle['line']['output'].keys()),
+        }
+        return bundle
+
+    for component_id, component_property, _ in SELECTION_OUTPUTS:
+        app.clientside_callback(
+            # Functions are named after their component, plus the property when it is not the main one
+            ClientsideFunction(namespace='pod', function_name=component_id if component_property in ('figure', 'data') else f'{component_id}_{component_property}'),
+            Output(component_id=component_id, component_property=component_property),
+            Input(component_id='line_bundle', component_property='data'),
+            Input(component_id='data_workcell', component_property='value'),
+            State(component_id=component_id, component_property=component_property)
+        )
+else:
+    for component_id, component_property, callback in SELECTION_OUTPUTS:
+        if component_property == 'data':
+            # Tables are paged, sorted and filtered here, see tables.page()
+            app.callback(
+                Output(component_id=component_id, component_property='data'),
+                Output(component_id=component_id, component_property='page_count'),
+                *SELECTION,
+                Input(component_id=component_id, component_property='page_current'),
+                Input(component_id=component_id, component_property='page_size'),
+                Input(component_id=component_id, component_property='sort_by'),
+                Input(component_id=component_id, component_property='filter_query')
+            )(callback)
+        else:
+            app.callback(Output(component_id=component_id, component_property=component_property), *SELECTION)(callback)
 
-    mul_fig.add_trace(
-        go.Scatter(x=default_hourly_downtime_df.index, y=default_hourly_downtime_df['Total_minutes'], name="Downtime in minutes"),
-        secondary_y=True,
-    )
 
-    # Add mul_figure title
-    mul_fig.update_layout(
-        title_text="Hourly output and downtime in minutes"
-    )
-
-    # Set x-axis title
-    mul_fig.update_xaxes(title_text="Createtime")
-
-    # Set y-axes titles
-    mul_fig.update_yaxes(title_text="<b>Output</b>", secondary_y=False)
-    mul_fig.update_yaxes(title_text="<b>Downtime</b> in minutes", secondary_y=True)
-
-    # Update alarm figure and data table
-    alarm_update_data = alarm_df[data_line][data_date][alarm_df[data_line][data_date]["WORKCELL"] == data_workcell + 1].copy()
-    print(alarm_update_data)
-    alarm_fig = px.bar(alarm_update_data, y='count', color="alarm_code", text="alarm_code")
+@app.callback(
+    Output(component_id='output_downtime_graph', component_property='figure', allow_duplicate=True),
+    Input(component_id='output_downtime_graph', component_property='relayoutData'),
+    State(component_id='data_date', component_property='value'),
+    State(component_id='data_line', component_property='value'),
+    State(component_id='data_workcell', component_property='value'),
+    prevent_initial_call=True
+)
+def zoom_output_downtime_graph(relayout_data, data_date, data_line, data_workcell):
+    # Re-fetch the zoomed range at full resolution; short series are already complete
+    x_range = downsample.x_range(relayout_data)
+    output_df = store.slice('output', data_line, data_workcell + 1, data_date)
+    hourly_downtime_df = store.slice('hourly_downtime', data_line, data_workcell + 1, data_date)
+    if x_range is False or max(len(output_df), len(hourly_downtime_df)) <= downsample.THRESHOLD:
+        return dash.no_update
+    return figures.patch(figures.output_downtime_traces(output_df, hourly_downtime_df, x_range))
+
+
+@app.callback(Output(component_id='export_links', component_property='children'), *SELECTION)
+def update_export_links(data_date, data_line, data_workcell):
+    # Download the selected slices instead of copying them out of the tables
+    workcell = data_workcell + 1
+    output_kind = LINE_KINDS['output'] if workcell == facts.LINE else 'output'
+    links = ['Export:']
+    for label, kind in (('Output', output_kind), ('Downtime', 'downtime_breakdown'), ('Alarms', 'alarm')):
+        for fmt in export.FORMATS:
+            href = export.url(kind, fmt, [data_line], [workcell], data_date, data_date)
+            links.append(html.A(f'{label} ({fmt})', href=href, style={"marginLeft": '10px'}))
+    return links
+
+
+trends.register(app, lambda: store)
+overview.register(app, lambda: store)
+alarms.register(app, lambda: store, results)
+oee.register(app, lambda: store)
+export.register(server, lambda: store)
 
 
-    return mul_fig, output_data_table_df.to_dict('records'), downtime_fig_pie, downtime_data_table_df.to_dict('records'), alarm_fig, alarm_update_data.to_dict('records')
+@app.callback(
+    Output(component_id='data_date', component_property='options'),
+    Output(component_id='data_line', component_property='options'),
+    Input(component_id='reload_interval', component_property='n_intervals'),
+    State(component_id='data_date', component_property='options'),
+    State(component_id='data_line', component_property='options'),
+    prevent_initial_call=True
+)
+def refresh_options(n_intervals, date_options, line_options):
+    # Pick up dates and lines added by a reload without restarting
+    new_date_options = [{"label": f"{i}", "value": i} for i in store.dates]
+    new_line_options = [{"label": i, "value": i} for i in store.lines]
+    return (
+        dash.no_update if new_date_options == date_options else new_date_options,
+        dash.no_update if new_line_options == line_options else new_line_options,
+    )
 
 if __name__ == '__main__':
     # app.run_server(debug=True)
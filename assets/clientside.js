@@ -0,0 +1,108 @@
+// Clientside rendering mode (POD_CLIENTSIDE=1).
+//
+// The server sends one columnar bundle per (line, date) with every
+// workcell's data (see DataStore.bundle). Switching workcell then only re-slices
+// that bundle here and swaps the trace arrays of the figures already on the
+// page, with no request to the server.
+
+(function () {
+    function records(columns) {
+        const names = Object.keys(columns);
+        const length = names.length ? columns[names[0]].length : 0;
+        const rows = new Array(length);
+        for (let i = 0; i < length; i++) {
+            const row = {};
+            for (const name of names) {
+                row[name] = columns[name][i];
+            }
+            rows[i] = row;
+        }
+        return rows;
+    }
+
+    // Dropdown value of the whole line, see LINE_WORKCELL in app.py
+    const LINE = -1;
+
+    function selected(bundle, workcell) {
+        if (!bundle || workcell === null || workcell === undefined) {
+            return null;
+        }
+        if (workcell === LINE) {
+            return bundle.line;
+        }
+        return bundle.workcells[workcell] || null;
+    }
+
+    function withTraces(figure, traces) {
+        // Shallow copies so Plotly sees a new figure object
+        const data = figure.data.map(function (trace, i) {
+            return Object.assign({}, trace, traces[i] || {});
+        });
+        return Object.assign({}, figure, {data: data});
+    }
+
+    function range(length) {
+        return Array.from({length: length}, function (_, i) { return i; });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        pod: {
+            output_downtime_graph: function (bundle, workcell, figure) {
+                const wc = selected(bundle, workcell);
+                if (!wc) {
+                    return window.dash_clientside.no_update;
+                }
+                return withTraces(figure, [
+                    {x: wc.output.Createtime, y: wc.output.HourlyOutput, text: wc.output.HourlyOutput},
+                    {x: wc.hourly_downtime.Createtime, y: wc.hourly_downtime.Total_minutes},
+                ]);
+            },
+
+            data_table: function (bundle, workcell) {
+                const wc = selected(bundle, workcell);
+                return wc ? records(wc.output) : window.dash_clientside.no_update;
+            },
+
+            data_table_columns: function (bundle, workcell) {
+                if (!bundle || workcell === null || workcell === undefined) {
+                    return window.dash_clientside.no_update;
+                }
+                return workcell === LINE ? bundle.columns.line : bundle.columns.workcell;
+            },
+
+            downtime_breakdown: function (bundle, workcell, figure) {
+                const wc = selected(bundle, workcell);
+                if (!wc) {
+                    return window.dash_clientside.no_update;
+                }
+                return withTraces(figure, [
+                    {labels: wc.downtime_breakdown.WORKCELL_STATUS, values: wc.downtime_breakdown.total_seconds},
+                ]);
+            },
+
+            downtime_table: function (bundle, workcell) {
+                const wc = selected(bundle, workcell);
+                return wc ? records(wc.downtime_breakdown) : window.dash_clientside.no_update;
+            },
+
+            alarm: function (bundle, workcell, figure) {
+                const wc = selected(bundle, workcell);
+                if (!wc) {
+                    return window.dash_clientside.no_update;
+                }
+                const codes = wc.alarm.alarm_code;
+                return withTraces(figure, [{
+                    x: range(codes.length),
+                    y: wc.alarm.count,
+                    text: codes,
+                    marker: Object.assign({}, figure.data[0].marker, {color: codes}),
+                }]);
+            },
+
+            alarm_data_table: function (bundle, workcell) {
+                const wc = selected(bundle, workcell);
+                return wc ? records(wc.alarm) : window.dash_clientside.no_update;
+            },
+        },
+    });
+})();
@@ -0,0 +1,51 @@
+# Payload size and server-side build time of the output/downtime figure
+# against the number of points, with and without downsample.py.
+#
+# "full" sends every point as SVG bar/scatter traces (what the figure did
+# before); "adaptive" is figures.output_downtime_traces(). Time covers
+# building the traces and serialising the figure to JSON; browser render
+# time is not measured here, but scales with the points sent.
+# Run from the repository root:
+#     python benchmarks/downsampling.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import figures  # noqa: E402
+
+
+def frames(points, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2021-12-01', periods=points, freq='min', name='Createtime')
+    output_df = pd.DataFrame({'HourlyOutput': rng.integers(0, 120, points)}, index=index)
+    hourly_downtime_df = pd.DataFrame({'Total_minutes': np.abs(np.cumsum(rng.normal(size=points)))}, index=index)
+    return output_df, hourly_downtime_df
+
+
+def full(output_df, hourly_downtime_df):
+    return [
+        {'type': 'bar', 'x': output_df.index, 'y': output_df['HourlyOutput'], 'text': output_df['HourlyOutput']},
+        {'type': 'scatter', 'x': hourly_downtime_df.index, 'y': hourly_downtime_df['Total_minutes']},
+    ]
+
+
+def run(label, fn, points):
+    output_df, hourly_downtime_df = frames(points)
+    start = time.perf_counter()
+    payload = figures.output_downtime_figure(fn(output_df, hourly_downtime_df)).to_json()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<10}{points:>10}{len(payload) / 2**10:12.0f} KiB{elapsed * 1e3:10.0f} ms')
+
+
+if __name__ == '__main__':
+    # Plotly validates lazily; keep its first-call import cost out of the table
+    figures.output_downtime_figure(full(*frames(2))).to_json()
+    print(f'{"":<10}{"points":>10}{"payload":>16}{"time":>13}')
+    for points in (24, 1_000, 10_000, 100_000, 1_000_000):
+        run('full', full, points)
+        run('adaptive', figures.output_downtime_traces, points)
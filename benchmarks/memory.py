@@ -0,0 +1,49 @@
+# In-memory footprint of the fact tables per line and kind, before and after
+# the ingest-time dtype policy (facts.compact).
+#
+# "before" is each line's frame with pandas' default dtypes (int64, float64,
+# object strings), which is what the loader produced until the policy;
+# "after" is the same frame as stored now. Runs on ./data, or with
+# --synthetic on generated data (see synthetic.py), e.g. a year of 7 lines.
+# Run from the repository root:
+#     python benchmarks/memory.py
+#     python benchmarks/memory.py --synthetic 7x365
+
+import argparse
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import synthetic  # noqa: E402
+from store import DataStore  # noqa: E402
+
+
+def report(data_dir, cache_dir):
+    df = DataStore(data_dir, cache_dir).memory_report()
+    with pd.option_context('display.width', 120, 'display.float_format', '{:.1f}'.format):
+        print(df.to_string(index=False))
+        print()
+        by_kind = df.groupby('kind', sort=False)[['rows', 'bytes_before', 'bytes_after']].sum()
+        by_kind.loc['total'] = by_kind.sum()
+        by_kind['ratio'] = by_kind['bytes_before'] / by_kind['bytes_after']
+        print(by_kind.to_string())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--synthetic', metavar='LINESxDAYS', help='report on generated data instead of ./data')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.synthetic:
+        lines, days = map(int, args.synthetic.split('x'))
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = os.path.join(tmp, 'data')
+            synthetic.generate(data_dir, lines, days, seed=args.seed)
+            report(data_dir, os.path.join(tmp, 'cache'))
+    else:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            report(os.path.join(ROOT, 'data'), cache_dir)
@@ -0,0 +1,48 @@
+# Cold selection of a closed day: built live vs. read from its snapshot.
+#
+# Snapshots of every closed day are written to a temporary cache first
+# (snapshots.warm). "live" then renders each (line, date, workcell) the way
+# the selection callbacks do without snapshots, on a fresh DataStore so no
+# slice is cached; "snapshot" reads the same outputs with
+# SnapshotStore.get, which includes the day digest the lookup is keyed by.
+# Run from the repository root:
+#     python benchmarks/snapshots.py
+
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import snapshots  # noqa: E402
+from store import DataStore  # noqa: E402
+
+WORKCELLS = [snapshots.WORKCELLS[0], 1, 5]
+
+
+def timed(label, select, selections):
+    start = time.perf_counter()
+    for line, date, workcell in selections:
+        select(line, date, workcell)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<12}{elapsed / len(selections) * 1000:8.1f} ms per selection')
+    return elapsed
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as cache_dir:
+        data_dir = os.path.join(ROOT, 'data')
+        store = DataStore(data_dir, cache_dir)
+        start = time.perf_counter()
+        days = snapshots.warm(store)
+        files = [os.path.join(d, f) for d, _, fs in os.walk(os.path.join(cache_dir, 'snapshots')) for f in fs]
+        print(f'{days} closed days, {len(files)} snapshots, {sum(map(os.path.getsize, files)) / 1e6:.1f} MB '
+              f'written in {time.perf_counter() - start:.1f} s')
+
+        selections = [(line, date, w) for line, date in snapshots.closed_days(store) for w in WORKCELLS]
+        live = DataStore(data_dir, cache_dir)
+        base = timed('live', lambda line, date, w: snapshots.render(live, line, date, w), selections)
+        snapshot_store, served = snapshots.SnapshotStore(cache_dir), DataStore(data_dir, cache_dir)
+        elapsed = timed('snapshot', lambda line, date, w: snapshot_store.get(served, line, date, w), selections)
+        print(f'{"":<12}{base / elapsed:8.1f}x')
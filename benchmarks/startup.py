@@ -0,0 +1,52 @@
+# Startup-time benchmark: openpyxl loader vs. the columnar workbook cache.
+#
+# Run from the repository root:
+#     python benchmarks/startup.py
+
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ingest  # noqa: E402
+
+KINDS = ('output', 'downtime', 'alarm')
+
+
+def load_openpyxl():
+    # The loader app.py used before the cache: one read_excel per sheet.
+    for kind in KINDS:
+        for x in ingest.discover(kind):
+            for y in range(len(pd.ExcelFile(x).sheet_names)):
+                pd.read_excel(x, sheet_name=y)
+
+
+def load_cached(cache_dir):
+    for kind in KINDS:
+        for x in ingest.discover(kind):
+            ingest.load_workbook(x, cache_dir=cache_dir)
+
+
+def build_parallel(cache_dir):
+    ingest.refresh([x for kind in KINDS for x in ingest.discover(kind)], cache_dir=cache_dir)
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<24}{elapsed:8.2f} s')
+    return elapsed
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as cache_dir:
+        base = timed('openpyxl (per sheet)', load_openpyxl)
+        timed('cache build (cold)', load_cached, cache_dir)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        timed('cache build (parallel)', build_parallel, cache_dir)
+        warm = timed('cache load (warm)', load_cached, cache_dir)
+    print(f'speed-up warm vs openpyxl: {base / warm:.0f}x')
@@ -0,0 +1,154 @@
+# Benchmark suite on synthetic plants of increasing size.
+#
+# For each scale (lines x days) a plant is generated with synthetic.py and
+# the app is started twice in a fresh process: once on an empty cache (cold
+# start: ingest, fact tables, rollups) and once on the cache that left
+# (warm start). Each start records its import time and memory; the warm one
+# then fires every selection callback through the Flask test client for a
+# sample of (date, line, workcell) selections, first on cold slices and
+# then again on cached ones. Results go to a JSON file so runs from
+# different releases can be compared.
+# Run from the repository root:
+#     python benchmarks/suite.py --scales 7x30 20x90 50x365 --out benchmarks/results/main.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Ahead of this directory, whose tables.py would shadow the app's
+sys.path.insert(0, ROOT)
+import synthetic  # noqa: E402
+
+SELECTION = ['data_date', 'data_line', 'data_workcell']
+# Values for the table inputs that come after the selection, see tables.page()
+TABLE_INPUTS = {'page_current': 0, 'page_size': 25, 'sort_by': [], 'filter_query': ''}
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)), 'max_ms': float(values.max())}
+
+
+def _body(dep, selection):
+    inputs = [dict(i, value=selection[n] if n < len(selection) else TABLE_INPUTS.get(i['property']))
+              for n, i in enumerate(dep['inputs'])]
+    outputs = [dict(zip(('id', 'property'), o.rsplit('.', 1))) for o in dep['output'].strip('.').split('...')]
+    return {'output': dep['output'], 'outputs': outputs if len(outputs) > 1 else outputs[0],
+            'inputs': inputs, 'state': [dict(s, value=None) for s in dep.get('state', [])],
+            'changedPropIds': []}
+
+
+def child(samples, seed):
+    """Runs inside the benchmarked process: start the app, then fire callbacks."""
+    start = time.perf_counter()
+    import app
+    import metrics
+    imported = time.perf_counter() - start
+    # The data is loaded in the background; the start ends when it is ready
+    app.loader.ready.wait()
+    result = {'import_s': imported, 'start_s': time.perf_counter() - start, 'rss_bytes': rss_bytes(),
+              'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    if samples:
+        client = app.server.test_client()
+        client.get('/')
+        deps = [d for d in client.get('/_dash-dependencies').get_json()
+                if [i['id'] for i in d['inputs']][:3] == SELECTION and d.get('clientside_function') is None]
+        rng = random.Random(seed)
+        store = app.store
+        selections = [(rng.choice(store.dates), rng.choice(store.lines), rng.randrange(10)) for _ in range(samples)]
+        latency = {}
+        for phase in ('cold', 'cached'):
+            timings = {metrics.callback_name(dep): [] for dep in deps}
+            totals = []
+            for selection in selections:
+                total = 0.0
+                for dep in deps:
+                    t = time.perf_counter()
+                    response = client.post('/_dash-update-component', json=_body(dep, selection))
+                    elapsed = time.perf_counter() - t
+                    assert response.status_code in (200, 204), response.data[:500]
+                    timings[metrics.callback_name(dep)].append(elapsed)
+                    total += elapsed
+                totals.append(total)
+            latency[phase] = {'selection': percentiles(totals),
+                              'callbacks': {name: percentiles(values) for name, values in timings.items()}}
+        result['latency'] = latency
+        result['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    json.dump(result, sys.stdout)
+
+
+def run_child(data_dir, cache_dir, samples, seed):
+    env = dict(os.environ, POD_DATA_DIR=data_dir, POD_CACHE_DIR=cache_dir, POD_RELOAD_INTERVAL='0')
+    env.pop('POD_RESULT_CACHE_DIR', None)
+    out = subprocess.run([sys.executable, __file__, '--child', str(samples), str(seed)],
+                         cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    # The app prints a line or two on import; the result is the last line
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench(lines, days, samples, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, cache_dir = os.path.join(tmp, 'data'), os.path.join(tmp, 'cache')
+        start = time.perf_counter()
+        synthetic.generate(data_dir, lines, days, seed=seed)
+        generated = time.perf_counter() - start
+        data_bytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(data_dir) for f in fs)
+        cold = run_child(data_dir, cache_dir, 0, seed)
+        warm = run_child(data_dir, cache_dir, samples, seed)
+    return {'lines': lines, 'days': days, 'generate_s': generated, 'data_bytes': data_bytes,
+            'cold': cold, 'warm': warm}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(int(sys.argv[2]), int(sys.argv[3]))
+        sys.exit()
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--scales', nargs='+', default=['7x30'], help='LINESxDAYS, e.g. 7x30 50x365')
+    parser.add_argument('--samples', type=int, default=50, help='selections fired per scale')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='JSON file (default benchmarks/results/<revision>.json)')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    results = {'revision': revision, 'python': platform.python_version(), 'machine': platform.machine(),
+               'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': []}
+    for scale in args.scales:
+        lines, days = (int(x) for x in scale.lower().split('x'))
+        run = bench(lines, days, args.samples, args.seed)
+        results['runs'].append(run)
+        print(f"{lines:>3} lines x {days:>3} days  cold start {run['cold']['start_s']:7.2f} s  "
+              f"warm start {run['warm']['start_s']:6.2f} s  rss {run['warm']['rss_bytes'] / 2**20:6.0f} MiB  "
+              f"selection p50 {run['warm']['latency']['cold']['selection']['p50_ms']:6.1f} ms cold, "
+              f"{run['warm']['latency']['cached']['selection']['p50_ms']:6.1f} ms cached")
+
+    out = args.out or os.path.join(ROOT, 'benchmarks', 'results', f'{revision or "unknown"}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'wrote {out}')
@@ -0,0 +1,142 @@
+# Synthetic plant data with the same workbook layout as ./data.
+#
+# Writes data/output, data/downtime, data/alarm and data/line workbooks for
+# any number of lines and days, so the ingest and callback paths can be
+# measured at scales the sample data does not reach. Values are random but
+# consistent where the dashboard relies on it (cumulative counters per day,
+# line output equal to the last workcell's).
+# Run from the repository root:
+#     python benchmarks/synthetic.py /tmp/pod-data --lines 7 --days 30
+
+import argparse
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+WORKCELLS = 10
+STATUSES = ('alarming', 'initialize', 'paused', 'uninitialized')
+ALARM_CODES = np.arange(20, 420)
+
+
+def line_names(lines):
+    return [f'L{i}' for i in range(1, lines + 1)]
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    return f'{seconds // 86400} days {seconds // 3600 % 24:02}:{seconds // 60 % 60:02}:{seconds % 60:02}'
+
+
+def _write(path, sheets):
+    # write_only streams rows to disk instead of building every cell in memory
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wb = openpyxl.Workbook(write_only=True)
+    for name, header, rows in sheets:
+        ws = wb.create_sheet(name)
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+
+
+def _rows(df):
+    return (list(row) for row in df.itertuples(index=False, name=None))
+
+
+def output_frames(line, days, start, rng):
+    """One frame per workcell with hourly cumulative counters, plus the line totals."""
+    hours = pd.date_range(start, periods=days * 24, freq='H')
+    day = np.arange(days * 24) // 24
+    frames = []
+    passed = rng.poisson(400, days * 24)
+    for workcell in range(1, WORKCELLS + 1):
+        hourly_input = passed
+        ng = rng.binomial(hourly_input, 0.01)
+        passed = hourly_input - ng
+        cumulative = lambda x: pd.Series(x).groupby(day).cumsum().to_numpy()  # noqa: E731
+        cum_input, cum_output, cum_ng = cumulative(hourly_input), cumulative(passed), cumulative(ng)
+        frames.append(pd.DataFrame({
+            'Createtime': hours.to_pydatetime(),
+            'LineNO': line,
+            'MachineNO': workcell,
+            'Input': cum_input,
+            'Output': cum_output,
+            'Sampling': 0,
+            'OK': 0,
+            'NGQty': cum_ng,
+            'Others': 0,
+            'NGRate': cum_ng / np.maximum(cum_input, 1),
+            'Yield': cum_output / np.maximum(cum_input, 1),
+            'YieldWithoutSample': cum_output / np.maximum(cum_input, 1),
+            'HourlyOutput': passed,
+        }))
+    first, last = frames[0], frames[-1]
+    line_df = pd.DataFrame({
+        'Createtime': last['Createtime'],
+        'LineNO': line,
+        'Input': first['Input'],
+        'Output': last['Output'],
+        'Sample': 0.0,
+        'OK': 0,
+        'Others': 0,
+        'NGQty': first['Input'] - last['Output'],
+        'Yield': last['Output'] / np.maximum(first['Input'], 1),
+        'YieldWithoutSample': last['Output'] / np.maximum(first['Input'], 1),
+        'NGRate': 1 - last['Output'] / np.maximum(first['Input'], 1),
+        'HourlyOutput': last['HourlyOutput'],
+        'HourlyInput': first['Input'].groupby(day).diff().fillna(first['Input']).astype(int),
+    })
+    return frames, line_df
+
+
+def downtime_sheets(days, start, rng):
+    """hourly_downtime_, downtime_ and downtime_breakdown_ sheets for each day, in that order."""
+    for d in pd.date_range(start, periods=days, freq='D'):
+        date = d.strftime('%Y-%m-%d')
+        seconds = rng.exponential(300, (WORKCELLS, 24)).round()
+        hourly = ([d.to_pydatetime() + pd.Timedelta(hours=h), w + 1, _duration(seconds[w, h]), float(seconds[w, h])]
+                  for w in range(WORKCELLS) for h in range(24))
+        yield f'hourly_downtime_{date}', ['Createtime', 'WORKCELL', 'Duration', 'Total_seconds'], hourly
+        wcs = [f'wc{w + 1}' for w in range(WORKCELLS)]
+        yield f'downtime_{date}', [None] + wcs, [['total_duration'] + [_duration(s) for s in seconds.sum(axis=1)]]
+        split = rng.dirichlet(np.ones(len(STATUSES)), WORKCELLS) * seconds.sum(axis=1)[:, None]
+        yield (f'downtime_breakdown_{date}', ['WORKCELL_STATUS'] + wcs,
+               [[status] + [_duration(split[w, i]) for w in range(WORKCELLS)] for i, status in enumerate(STATUSES)])
+
+
+def alarm_sheets(days, start, rng):
+    """One sheet per day with each workcell's alarm codes, most frequent first."""
+    for d in pd.date_range(start, periods=days, freq='D'):
+        date = d.strftime('%Y-%m-%d')
+        rows = []
+        for workcell in range(1, WORKCELLS + 1):
+            codes = rng.choice(ALARM_CODES, rng.integers(5, 25), replace=False)
+            counts = np.sort(rng.zipf(1.6, len(codes)))[::-1]
+            rows += [[i, int(code), int(count), workcell, f'Alarm {code} at workcell {workcell}', date]
+                     for i, (code, count) in enumerate(zip(codes, counts))]
+        yield date, [None, 'alarm_code', 'count', 'WORKCELL', 'alarm', 'Date'], rows
+
+
+def generate(data_dir, lines=7, days=30, start='2021-12-01', seed=0):
+    """Write a synthetic plant of the given size under data_dir."""
+    rng = np.random.default_rng(seed)
+    for line in line_names(lines):
+        frames, line_df = output_frames(line, days, start, rng)
+        _write(os.path.join(data_dir, 'output', f'{line}_output.xlsx'),
+               [(f'WorkCell_{i + 1}', list(df.columns), _rows(df)) for i, df in enumerate(frames)])
+        _write(os.path.join(data_dir, 'line', f'{line}_line_output.xlsx'), [('test', list(line_df.columns), _rows(line_df))])
+        _write(os.path.join(data_dir, 'downtime', f'{line}_downtime.xlsx'), downtime_sheets(days, start, rng))
+        _write(os.path.join(data_dir, 'alarm', f'{line}_alarm.xlsx'), alarm_sheets(days, start, rng))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('data_dir')
+    parser.add_argument('--lines', type=int, default=7)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--start', default='2021-12-01')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.data_dir, args.lines, args.days, args.start, args.seed)
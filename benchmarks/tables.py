@@ -0,0 +1,71 @@
+# Micro-benchmark of the callback's table path.
+#
+# "legacy" repeats what update_output_graph used to do per request: copy,
+# reset_index, three per-cell .apply(make_float) calls, then pd.to_timedelta
+# and astype(str) on the downtime breakdown. "records" is the current
+# DataStore.records() path, first on a cold LRU and then warm.
+# Run from the repository root:
+#     python benchmarks/tables.py
+
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from store import DataStore  # noqa: E402
+
+make_float = lambda x: "{:,.2f}%".format(x*100)  # noqa: E731
+
+
+def legacy(store, line, workcell, date):
+    df = store.slice('output', line, workcell, date).copy()
+    df.reset_index(inplace=True)
+    df['NGRate'] = df['NGRate'].apply(make_float)
+    df['Yield'] = df['Yield'].apply(make_float)
+    df['YieldWithoutSample'] = df['YieldWithoutSample'].apply(make_float)
+    breakdown = store.slice('downtime_breakdown', line, workcell, date)
+    pie = pd.DataFrame({'total_time': pd.to_timedelta(breakdown['total_time'])})
+    pie['total_seconds'] = pie['total_time'].dt.total_seconds()
+    table = pie.copy()
+    table['total_time'] = table['total_time'].astype(str)
+    table.reset_index(inplace=True)
+    return df.to_dict('records'), table.to_dict('records')
+
+
+def records(store, line, workcell, date):
+    return store.records('output', line, workcell, date), store.records('downtime_breakdown', line, workcell, date)
+
+
+def run(label, fn, store, keys):
+    # Time and allocations are measured in separate passes since tracemalloc
+    # slows everything down; the LRU is cleared in between for the cold case
+    start = time.perf_counter()
+    for key in keys:
+        fn(store, *key)
+    elapsed = time.perf_counter() - start
+    if label.endswith('(cold)'):
+        store.slices.clear()
+        for key in keys:
+            store.slice('output', *key)
+            store.slice('downtime_breakdown', *key)
+    tracemalloc.start()
+    for key in keys:
+        fn(store, *key)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{label:<16}{elapsed / len(keys) * 1e6:10.0f} us/call{peak / 2**10:10.0f} KiB peak')
+
+
+if __name__ == '__main__':
+    store = DataStore()
+    keys = [(line, workcell, date) for line in store.lines for workcell in range(1, 11) for date in store.dates[:5]]
+    for key in keys:
+        # Warm the slices so only the table work is measured
+        store.slice('output', *key)
+        store.slice('downtime_breakdown', *key)
+    run('legacy', legacy, store, keys)
+    run('records (cold)', records, store, keys)
+    run('records (warm)', records, store, keys)
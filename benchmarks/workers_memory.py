@@ -0,0 +1,79 @@
+# Memory per gunicorn worker with and without POD_PRELOAD.
+#
+# Starts gunicorn with 1, 4 and 8 workers, sends a few dashboard requests so
+# every worker has loaded some data, then reports RSS and PSS (proportional
+# set size: shared pages are split between the processes that map them).
+# Linux only, needs gunicorn and psutil. Run from the repository root:
+#     python benchmarks/workers_memory.py
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+import psutil
+
+PORT = 8097
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+OUTPUTS = [('output_downtime_graph', 'figure'), ('data_table', 'data'), ('downtime_breakdown', 'figure'),
+           ('downtime_table', 'data'), ('alarm', 'figure'), ('alarm_data_table', 'data')]
+
+
+def fire(date, line, workcell):
+    # One request per output, as the browser sends them
+    for component, prop in OUTPUTS:
+        body = {
+            'output': f'{component}.{prop}',
+            'outputs': {'id': component, 'property': prop},
+            'inputs': [{'id': 'data_date', 'property': 'value', 'value': date},
+                       {'id': 'data_line', 'property': 'value', 'value': line},
+                       {'id': 'data_workcell', 'property': 'value', 'value': workcell}],
+            'changedPropIds': ['data_workcell.value'],
+            'state': [],
+        }
+        request = urllib.request.Request(f'http://127.0.0.1:{PORT}/_dash-update-component', json.dumps(body).encode(),
+                                         {'Content-Type': 'application/json'})
+        urllib.request.urlopen(request, timeout=60).read()
+
+
+def wait_ready(timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{PORT}/', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError('gunicorn did not come up')
+
+
+def measure(workers, preload):
+    env = dict(os.environ, POD_PRELOAD='1' if preload else '0')
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{PORT}', 'app:server'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready()
+        # Workers boot one after another; give the last one time to import
+        time.sleep(2 if preload else 5 * workers)
+        for i in range(4 * workers):
+            fire('2021-12-0%d' % (1 + i % 9), 'L1', i % 10)
+        procs = psutil.Process(master.pid).children()
+        rss = [p.memory_info().rss for p in procs]
+        pss = [p.memory_full_info().pss for p in procs]
+        return sum(rss) / len(rss), sum(pss) / len(pss), sum(pss) + psutil.Process(master.pid).memory_full_info().pss
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+
+if __name__ == '__main__':
+    print(f'{"mode":<10}{"workers":>8}{"RSS/worker":>14}{"PSS/worker":>14}{"PSS total":>14}')
+    for preload in (False, True):
+        for workers in (1, 4, 8):
+            rss, pss, total = measure(workers, preload)
+            print(f'{"preload" if preload else "default":<10}{workers:>8}{rss / 2**20:>12.0f}MB{pss / 2**20:>12.0f}MB{total / 2**20:>12.0f}MB')
@@ -0,0 +1,62 @@
+# Parse time of the output workbooks: pd.read_excel vs. xlsx.read_workbook.
+#
+# Every reader parses each workbook under data/output in full, several times;
+# the best round is reported. The streaming reader's frames are checked
+# against read_excel's first, values compared and dtypes ignored: the known
+# columns get their type from xlsx.DTYPES, which e.g. makes Yield float64
+# even on a sheet where it happens to be all whole numbers.
+# Run from the repository root:
+#     python benchmarks/xlsx_reader.py
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ingest  # noqa: E402
+import xlsx  # noqa: E402
+
+ROUNDS = 3
+
+
+def read_excel(path):
+    return pd.read_excel(path, sheet_name=None)
+
+
+def streaming(engine):
+    return lambda path: xlsx.read_workbook(path, engine=engine)
+
+
+def check(files, read):
+    for x in files:
+        expected, actual = read_excel(x), read(x)
+        assert list(expected) == list(actual), x
+        for name in expected:
+            pd.testing.assert_frame_equal(expected[name], actual[name], check_dtype=False, obj=f'{x} {name}')
+
+
+def timed(label, read, files):
+    best = float('inf')
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for x in files:
+            read(x)
+        best = min(best, time.perf_counter() - start)
+    print(f'{label:<24}{best:8.2f} s')
+    return best
+
+
+if __name__ == '__main__':
+    files = ingest.discover('output')
+    engines = ['openpyxl'] + (['calamine'] if xlsx.CalamineWorkbook is not None else [])
+    for engine in engines:
+        check(files, streaming(engine))
+    print(f'{len(files)} workbooks, best of {ROUNDS}')
+    base = timed('pd.read_excel', read_excel, files)
+    for engine in engines:
+        elapsed = timed(f'streaming ({engine})', streaming(engine), files)
+        print(f'{"":<24}{base / elapsed:8.1f}x')
+    if 'calamine' not in engines:
+        print('python-calamine is not installed; pip install python-calamine to compare it')
@@ -0,0 +1,65 @@
+# Date range, line and workcell controls shared by the range views (trends,
+# alarm analytics, OEE).
+#
+# Component ids are <prefix>_range, <prefix>_line and <prefix>_workcell;
+# selected() turns their values into query arguments.
+
+from dash import dcc, html
+
+import facts
+
+ALL_WORKCELLS = 'all'
+
+
+def labelled(label, component):
+    return html.Div(
+        children=[
+            html.Label(label),
+            component,
+        ],
+        style={"width": '100%', "padding": '10px'}
+    )
+
+
+def controls(prefix, store, *extra):
+    """The row of a view's controls: date range, line, workcell, then any labelled extra ones."""
+    dates = store.dates
+    return html.Div(
+        children=[
+            labelled('Date range', html.Div(
+                dcc.DatePickerRange(
+                    id=f"{prefix}_range",
+                    min_date_allowed=dates[0],
+                    max_date_allowed=dates[-1],
+                    start_date=dates[0],
+                    end_date=dates[-1],
+                    display_format='YYYY-MM-DD'
+                ),
+                style={"marginTop": '10px'}
+            )),
+
+            labelled('Line Number', dcc.Dropdown(
+                id=f"{prefix}_line",
+                options=[{"label": i, "value": i} for i in store.lines],
+                value=store.lines[0],
+                style={"marginTop": '10px'}
+            )),
+
+            labelled('Workcell Number', dcc.Dropdown(
+                id=f"{prefix}_workcell",
+                options=[{"label": "All workcells", "value": ALL_WORKCELLS}]
+                + [{"label": f"Workcell {i}", "value": i} for i in range(1, facts.WORKCELLS + 1)],
+                value=ALL_WORKCELLS,
+                style={"marginTop": '10px'}
+            )),
+
+            *extra,
+        ],
+        style={'display': 'flex', 'justifyContent': 'space-between'}
+    )
+
+
+def selected(start_date, end_date, workcell):
+    """(start, end, workcell) for a query: YYYY-MM-DD dates, None for a cleared one or for all workcells."""
+    return (start_date[:10] if start_date else None, end_date[:10] if end_date else None,
+            None if workcell == ALL_WORKCELLS else workcell)
@@ -0,0 +1,100 @@
+# Server-side downsampling for long time series.
+#
+# Up to THRESHOLD points a trace is sent as is and drawn as SVG. Past that it
+# is reduced to about MAX_POINTS points (largest-triangle-three-buckets for
+# lines, min/max per bucket for counts, so peaks survive) and drawn with
+# WebGL. Zooming re-fetches the visible range at full budget, see
+# x_range().
+
+import os
+
+import numpy as np
+import pandas as pd
+
+THRESHOLD = int(os.environ.get('POD_WEBGL_THRESHOLD', 2000))
+MAX_POINTS = int(os.environ.get('POD_MAX_POINTS', 2000))
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb(x, y, n):
+    """Indices of the n points picked by largest-triangle-three-buckets."""
+    length = len(y)
+    if n >= length or n < 3:
+        return np.arange(length)
+    x, y = _numeric(x), np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # First and last points are kept; the rest is split into n - 2 buckets
+    edges = np.linspace(1, length - 1, n - 1).astype(np.int64)
+    picked = np.empty(n, dtype=np.int64)
+    picked[0], picked[-1] = 0, length - 1
+    previous = 0
+    for i in range(n - 2):
+        start, stop = edges[i], edges[i + 1]
+        following = slice(stop, edges[i + 2]) if i + 2 < len(edges) else slice(length - 1, length)
+        cx, cy = x[following].mean(), y[following].mean()
+        ax, ay = x[previous], y[previous]
+        area = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        previous = start + int(np.argmax(area))
+        picked[i + 1] = previous
+    return picked
+
+
+def minmax(y, n):
+    """Indices of the minimum and maximum of n // 2 equal buckets, in order."""
+    length = len(y)
+    if n >= length or n < 2:
+        return np.arange(length)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    buckets = n // 2
+    edges = np.linspace(0, length, buckets + 1).astype(np.int64)
+    # Pad to a rectangle so every bucket's argmin/argmax is one vectorised call
+    width = int(np.diff(edges).max())
+    rows = edges[:-1, None] + np.arange(width)
+    valid = rows < edges[1:, None]
+    rows = np.minimum(rows, length - 1)
+    values = y[rows]
+    lows = np.where(valid, values, np.inf).argmin(axis=1)
+    highs = np.where(valid, values, -np.inf).argmax(axis=1)
+    return np.unique(np.concatenate([edges[:-1] + lows, edges[:-1] + highs]))
+
+
+def visible(df, x_range):
+    """Rows of a frame indexed by time that fall inside x_range (None for all)."""
+    if x_range is None or df.empty:
+        return df
+    start, stop = df.index.searchsorted([pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])], side='left')
+    # One point either side keeps lines running to the edges of the view
+    return df.iloc[max(start - 1, 0):stop + 1]
+
+
+def x_range(relayout_data):
+    """The x range a relayoutData event zoomed to, None after a reset, or False if x did not change."""
+    relayout_data = relayout_data or {}
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'])
+    return False
+
+
+def line(x, y, **trace):
+    """A line trace, downsampled with LTTB and drawn with WebGL above THRESHOLD points."""
+    if len(y) <= THRESHOLD:
+        return {'type': 'scatter', 'x': x, 'y': y, **trace}
+    picked = lttb(x, y, MAX_POINTS)
+    return {'type': 'scattergl', 'mode': 'lines', 'x': np.asarray(x)[picked], 'y': np.asarray(y)[picked], **trace}
+
+
+def bars(x, y, **trace):
+    """A bar trace; above THRESHOLD points a min/max-downsampled WebGL line instead."""
+    if len(y) <= THRESHOLD:
+        return {'type': 'bar', 'x': x, 'y': y, 'text': y, **trace}
+    picked = minmax(y, MAX_POINTS)
+    return {'type': 'scattergl', 'mode': 'lines', 'x': np.asarray(x)[picked], 'y': np.asarray(y)[picked], 'text': None, **trace}
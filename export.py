@@ -0,0 +1,129 @@
+# Export endpoint for fact-table slices.
+#
+#     /export/<kind>.csv?lines=L1,L2&workcells=1,2&start=2021-12-01&end=2021-12-07
+#     /export/<kind>.parquet?...
+#
+# Every parameter is optional and defaults to everything. The rows are
+# streamed from the memory-mapped fact tables a batch at a time, so memory
+# stays flat however large the selection is.
+
+import io
+import os
+import urllib.parse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Response, abort, request, stream_with_context
+
+import facts
+
+CHUNK_ROWS = int(os.environ.get('POD_EXPORT_CHUNK_ROWS', 64 * 1024))
+FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def url(kind, fmt='csv', lines=None, workcells=None, start=None, end=None):
+    params = {'lines': ','.join(lines or []), 'workcells': ','.join(str(w) for w in workcells or []),
+              'start': start or '', 'end': end or ''}
+    return f'/export/{kind}.{fmt}?' + urllib.parse.urlencode({k: v for k, v in params.items() if v})
+
+
+def _list(name, convert=str):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return [convert(v) for v in value.split(',')]
+    except ValueError:
+        abort(400, f'bad {name}: {value}')
+
+
+def _date(name):
+    # The fact tables compare dates as YYYY-MM-DD strings, so anything else
+    # would select the wrong rows
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        date = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        date = pd.NaT
+    if pd.isna(date):
+        abort(400, f'bad {name}: {value}')
+    return date.strftime('%Y-%m-%d')
+
+
+def _slices(table):
+    # Zero-copy slices of CHUNK_ROWS rows; a selection is made of many small
+    # chunks (one per group), so to_batches() would give tiny pieces
+    for start in range(0, max(table.num_rows, 1), CHUNK_ROWS):
+        yield table.slice(start, CHUNK_ROWS)
+
+
+def csv_chunks(table):
+    """CSV text for table, one chunk of rows at a time."""
+    for i, part in enumerate(_slices(table)):
+        yield part.to_pandas().to_csv(index=False, header=i == 0)
+
+
+class _Drain:
+    """Write-only file that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.position += len(data)
+        return self.buffer.write(data)
+
+    def tell(self):
+        # The Parquet footer records absolute offsets, so report the total
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def parquet_chunks(table):
+    """A Parquet file for table, written and sent one row group at a time."""
+    sink = _Drain()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), table.schema)
+    for part in _slices(table):
+        if part.num_rows:
+            writer.write_table(part, row_group_size=CHUNK_ROWS)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def register(server, get_store):
+    """Add the /export route; ``get_store`` returns the current DataStore."""
+
+    @server.route('/export/<kind>.<fmt>')
+    def export(kind, fmt):
+        if kind not in facts.KINDS or fmt not in FORMATS:
+            abort(404)
+        store = get_store()
+        if store is None:
+            # Still loading, see loading.py
+            abort(503)
+        table = store.facts[kind].select(
+            lines=_list('lines'),
+            workcells=_list('workcells', int),
+            start=_date('start'),
+            end=_date('end'),
+        )
+        chunks = csv_chunks(table) if fmt == 'csv' else parquet_chunks(table)
+        return Response(stream_with_context(chunks), mimetype=FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'})
@@ -0,0 +1,285 @@
+# Long-form fact tables, one per data kind, built from the workbook cache.
+#
+# Every kind is stored as a single Arrow file sorted by (line, workcell,
+# date, time) with the key columns ``line``, ``workcell`` and ``date`` in
+# front. Because the rows of any (line, workcell, date) are contiguous, a
+# slice is a zero-copy ``Table.slice`` found through a dict of group offsets,
+# and cross-line queries are a handful of contiguous ranges.
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+import ingest
+
+KINDS = ('output', 'hourly_downtime', 'downtime_breakdown', 'downtime', 'alarm', 'line_output')
+KEYS = ['line', 'workcell', 'date']
+SOURCES = {
+    'output': 'output',
+    'hourly_downtime': 'downtime',
+    'downtime_breakdown': 'downtime',
+    'downtime': 'downtime',
+    'alarm': 'alarm',
+    'line_output': 'line',
+}
+WORKCELLS = 10
+# Workcell number under which line-level rows are stored
+LINE = 0
+# Bump when the layout of the fact tables changes, to force a rebuild
+FORMAT_VERSION = 3
+# Text columns with at most this share of distinct values are stored as
+# categoricals (Arrow dictionaries), see compact()
+CATEGORY_RATIO = 0.5
+
+
+def fact_file(kind, cache_dir=ingest.CACHE_DIR):
+    return os.path.join(cache_dir, 'facts', f'{kind}.arrow')
+
+
+def sources_digest(paths, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    h = hashlib.sha1(str(FORMAT_VERSION).encode())
+    for x in sorted(paths):
+        h.update(x.encode())
+        h.update(ingest.manifest(x, data_dir, cache_dir)['sha1'].encode())
+    return h.hexdigest()
+
+
+def _keyed(df, line, workcell, date):
+    df.insert(0, 'date', date)
+    df.insert(0, 'workcell', workcell)
+    df.insert(0, 'line', line)
+    return df
+
+
+def _output_frames(files, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    for line, x in files.items():
+        sheets = list(ingest.load_workbook(x, data_dir, cache_dir).values())
+        for y in range(WORKCELLS):
+            df = sheets[y]
+            yield _keyed(df, line, np.int16(y + 1), df['Createtime'].dt.normalize())
+
+
+# Downtime sheets are named <kind>_<date>; kinds are matched longest first
+DOWNTIME_SHEETS = ('hourly_downtime', 'downtime_breakdown', 'downtime')
+
+
+def classify_downtime_sheet(name, df):
+    """(kind, date) of a downtime sheet from its name, or from its columns when the name does not say."""
+    match = ingest.DATE.search(name)
+    date = pd.Timestamp(match.group(0)) if match else None
+    kind = next((k for k in DOWNTIME_SHEETS if name.startswith(k)), None)
+    if kind is None:
+        kind = 'hourly_downtime' if 'Createtime' in df else 'downtime_breakdown' if 'WORKCELL_STATUS' in df else 'downtime'
+    if date is None and 'Createtime' in df and len(df):
+        date = pd.Timestamp(df['Createtime'].iloc[0]).normalize()
+    return kind, date
+
+
+def _downtime_frames(files, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    # One pass over the sheets, each classified on its own, so missing or
+    # reordered sheets are fine. The wide sheets (one wcN duration column per
+    # workcell) of all days are melted and their "0 days 00:14:10" strings
+    # parsed in one go per kind.
+    hourly, wide = [], {'downtime_breakdown': [], 'downtime': []}
+    for line, x in files.items():
+        for name, df in ingest.load_workbook(x, data_dir, cache_dir).items():
+            kind, date = classify_downtime_sheet(name, df)
+            if kind == 'hourly_downtime':
+                hourly.append(_keyed(df, line, df['WORKCELL'].astype(np.int16), df['Createtime'].dt.normalize()))
+            elif date is None:
+                print(f'{x}: skipping sheet {name!r}, no date in its name')
+            else:
+                index = 'WORKCELL_STATUS' if kind == 'downtime_breakdown' else df.columns[0]
+                df = df.rename(columns={index: 'status'})
+                df['status'] = df['status'].astype(str)
+                df['line'], df['date'] = line, date
+                wide[kind].append((index, df))
+
+    frames = {'hourly_downtime': []}
+    if hourly:
+        df = pd.concat(hourly, ignore_index=True).fillna(0)
+        df['Total_minutes'] = np.round(df['Total_seconds'] / 60, 0)
+        frames['hourly_downtime'] = [df]
+    for kind, sheets in wide.items():
+        frames[kind] = []
+        for index in dict.fromkeys(index for index, _ in sheets):
+            df = pd.concat([df for i, df in sheets if i == index], ignore_index=True)
+            columns = [f'wc{y + 1}' for y in range(WORKCELLS) if f'wc{y + 1}' in df]
+            df = df.melt(id_vars=['line', 'date', 'status'], value_vars=columns, var_name='workcell', value_name='duration')
+            durations = pd.to_timedelta(df.pop('duration').fillna('0 days 00:00:00'))
+            frames[kind].append(pd.DataFrame({
+                'line': df['line'],
+                'workcell': df['workcell'].str[2:].astype(np.int16),
+                'date': df['date'],
+                index: df['status'],
+                'total_time': durations.astype(str),
+                'total_seconds': np.round(durations.dt.total_seconds(), 0),
+            }))
+    return frames
+
+
+def _alarm_frames(files, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    for line, x in files.items():
+        for temp in ingest.load_workbook(x, data_dir, cache_dir).values():
+            temp = temp.drop(["Unnamed: 0"], axis=1)
+            yield _keyed(temp, line, temp['WORKCELL'].astype(np.int16), pd.Timestamp(temp["Date"][0]))
+
+
+def _line_output_frames(files, output, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    # The line workbooks have one sheet of hourly line totals. The line is
+    # serial, so what leaves it is what leaves the last workcell (summing the
+    # workcells would count every part ten times); that is checked here, once,
+    # against the workcell facts
+    last = output.filter(pc.equal(output.column('workcell'), WORKCELLS)).select(['line', 'Createtime', 'Output']).to_pandas()
+    last = last.set_index(['line', 'Createtime'])['Output']
+    for line, x in files.items():
+        df = next(iter(ingest.load_workbook(x, data_dir, cache_dir).values()))
+        df['WorkcellOutput'] = last.reindex(pd.MultiIndex.from_arrays([np.full(len(df), line), df['Createtime']])).to_numpy()
+        df['Consistent'] = df['Output'] == df['WorkcellOutput']
+        mismatched = int((~df['Consistent']).sum())
+        if mismatched:
+            print(f'{x}: {mismatched} of {len(df)} hours disagree with the workcell totals')
+        yield _keyed(df, line, np.int16(LINE), df['Createtime'].dt.normalize())
+
+
+def compact(df):
+    """Downcast df's columns in place to the smallest lossless dtype, and return it.
+
+    Integer columns become int16 or int32, whole-number floats (seconds,
+    minutes) float32, and repetitive text (statuses, line numbers, alarm
+    texts) categoricals with sorted categories, so sorting on them stays
+    alphabetical. Ratios keep float64.
+    """
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_bool_dtype(col) or pd.api.types.is_datetime64_any_dtype(col):
+            continue
+        if pd.api.types.is_integer_dtype(col):
+            low, high = (col.min(), col.max()) if len(col) else (0, 0)
+            for dtype in (np.int16, np.int32):
+                if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                    df[name] = col.astype(dtype)
+                    break
+        elif pd.api.types.is_float_dtype(col):
+            values = col.dropna().to_numpy()
+            if (values == np.round(values)).all() and (np.abs(values) < 2 ** 24).all():
+                df[name] = col.astype(np.float32)
+        elif col.dtype == object and col.nunique() <= CATEGORY_RATIO * len(col):
+            df[name] = col.astype('category')
+    return df
+
+
+def _write(kind, frames, digest, cache_dir):
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=KEYS)
+    # A stable sort keeps each sheet's own row order (time, or alarm rank)
+    order = ['line', 'workcell', 'date'] + (['Createtime'] if 'Createtime' in df.keys() else [])
+    df = df.sort_values(order, kind='mergesort', ignore_index=True)
+    df['line'] = df['line'].astype('category')
+    compact(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'pod_sources': digest.encode()})
+    path = fact_file(kind, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    feather.write_feather(table, path + '.tmp', compression='uncompressed')
+    os.replace(path + '.tmp', path)
+
+
+def _stored_digest(kind, cache_dir):
+    try:
+        schema = feather.read_table(fact_file(kind, cache_dir), memory_map=True).schema
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return (schema.metadata or {}).get(b'pod_sources', b'').decode()
+
+
+def ensure(files, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR):
+    """(Re)build the fact tables whose source workbooks changed.
+
+    ``files`` maps each workbook kind (output/downtime/alarm/line) to
+    ``{line: path}``; the workbook cache must already be current.
+    """
+    digests = {kind: sources_digest(paths.values(), data_dir, cache_dir) for kind, paths in files.items()}
+    # Line output is checked against the workcell output, so depends on both
+    digests['line'] = hashlib.sha1((digests['line'] + digests['output']).encode()).hexdigest()
+    stale = [kind for kind in KINDS if _stored_digest(kind, cache_dir) != digests[SOURCES[kind]]]
+    if 'output' in stale:
+        _write('output', list(_output_frames(files['output'], data_dir, cache_dir)), digests['output'], cache_dir)
+    if any(SOURCES[kind] == 'downtime' for kind in stale):
+        for kind, frames in _downtime_frames(files['downtime'], data_dir, cache_dir).items():
+            _write(kind, frames, digests['downtime'], cache_dir)
+    if 'alarm' in stale:
+        _write('alarm', list(_alarm_frames(files['alarm'], data_dir, cache_dir)), digests['alarm'], cache_dir)
+    if 'line_output' in stale:
+        output = feather.read_table(fact_file('output', cache_dir), memory_map=True)
+        _write('line_output', list(_line_output_frames(files['line'], output, data_dir, cache_dir)), digests['line'], cache_dir)
+    return stale
+
+
+class FactTable:
+    """A memory-mapped fact table plus the offsets of its (line, workcell, date) groups."""
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = [c for c in table.column_names if c not in KEYS]
+        self.offsets = {}
+        # (line, date) -> the ranges of its workcells' groups, in table order
+        self.days = {}
+        self._day_digests = None
+        if table.num_rows == 0:
+            return
+        line = table.column('line').combine_chunks()
+        codes = line.indices.to_numpy(zero_copy_only=False)
+        workcell = table.column('workcell').to_numpy()
+        date = table.column('date').to_numpy().astype('datetime64[D]')
+        change = np.flatnonzero((codes[1:] != codes[:-1]) | (workcell[1:] != workcell[:-1]) | (date[1:] != date[:-1])) + 1
+        starts = np.concatenate([[0], change])
+        stops = np.concatenate([change, [len(codes)]])
+        names = line.dictionary.to_pylist()
+        for start, stop in zip(starts, stops):
+            key = (names[codes[start]], int(workcell[start]), str(date[start]))
+            self.offsets[key] = (int(start), int(stop))
+            self.days.setdefault((key[0], key[2]), []).append((int(start), int(stop)))
+
+    @classmethod
+    def open(cls, kind, cache_dir=ingest.CACHE_DIR):
+        return cls(feather.read_table(fact_file(kind, cache_dir), memory_map=True))
+
+    def lines(self):
+        return sorted({key[0] for key in self.offsets})
+
+    def dates(self, line=None):
+        return sorted({key[2] for key in self.offsets if line is None or key[0] == line})
+
+    def slice(self, line, workcell, date):
+        """Rows of one (line, workcell, date) as a zero-copy Arrow table, without the key columns."""
+        start, stop = self.offsets.get((line, workcell, date), (0, 0))
+        return self.table.slice(start, stop - start).select(self.columns)
+
+    def day_digests(self):
+        """sha1 of the rows of each (line, date), independent of dictionaries and schema metadata.
+
+        Every row is hashed in one vectorised pass, on first use; a day's
+        digest then only covers its own rows' hashes.
+        """
+        if self._day_digests is None:
+            rows = pd.util.hash_pandas_object(self.table.to_pandas(), index=False).to_numpy() if self.days else None
+            self._day_digests = {key: hashlib.sha1(b''.join(rows[a:b].tobytes() for a, b in ranges)).hexdigest()
+                                 for key, ranges in self.days.items()}
+        return self._day_digests
+
+    def select(self, lines=None, workcells=None, start=None, end=None, keys=True):
+        """Rows for any combination of lines, workcells and an inclusive date range.
+
+        Each matching group is a contiguous range, so this only concatenates
+        zero-copy slices.
+        """
+        parts = [self.table.slice(a, b - a) for (line, workcell, date), (a, b) in self.offsets.items()
+                 if (lines is None or line in lines) and (workcells is None or workcell in workcells)
+                 and (start is None or date >= start) and (end is None or date <= end)]
+        table = pa.concat_tables(parts) if parts else self.table.slice(0, 0)
+        return table if keys else table.select(self.columns)
@@ -0,0 +1,79 @@
+# Figures for the dashboard.
+#
+# Each figure is built in full once for the initial layout. Later updates
+# only send its trace arrays as a dash.Patch, so the layout, template and
+# subplot specs are not rebuilt or re-sent on every dropdown change.
+
+import plotly.express as px
+from dash import Patch
+from plotly.subplots import make_subplots
+
+import downsample
+
+
+def output_downtime_traces(output_df, hourly_downtime_df, x_range=None):
+    # Long ranges are downsampled and switched to WebGL, see downsample.py
+    output_df = downsample.visible(output_df, x_range)
+    hourly_downtime_df = downsample.visible(hourly_downtime_df, x_range)
+    return [
+        downsample.bars(output_df.index, output_df["HourlyOutput"]),
+        downsample.line(hourly_downtime_df.index, hourly_downtime_df['Total_minutes']),
+    ]
+
+
+def output_downtime_figure(traces):
+    # Create figure with output and downtime
+    mul_fig = make_subplots(specs=[[{"secondary_y": True}]])
+    # Add traces
+    mul_fig.add_trace(dict(name="Hourly output", **traces[0]), secondary_y=False)
+    mul_fig.add_trace(dict(name="Downtime in minutes", **traces[1]), secondary_y=True)
+
+    # Add mul_figure title
+    mul_fig.update_layout(
+        title_text="Hourly output and downtime in minutes"
+    )
+
+    # Set x-axis title
+    mul_fig.update_xaxes(title_text="Createtime")
+
+    # Set y-axes titles
+    mul_fig.update_yaxes(title_text="<b>Output</b>", secondary_y=False)
+    mul_fig.update_yaxes(title_text="<b>Downtime</b> in minutes", secondary_y=True)
+    return mul_fig
+
+
+def breakdown_traces(breakdown_df):
+    return [{'labels': breakdown_df.index, 'values': breakdown_df['total_seconds']}]
+
+
+def breakdown_figure(breakdown_df):
+    return px.pie(breakdown_df, values='total_seconds', names=breakdown_df.index)
+
+
+def alarm_traces(alarm_df):
+    return [{
+        'x': list(range(len(alarm_df))),
+        'y': alarm_df['count'],
+        'text': alarm_df['alarm_code'],
+        'marker': {'color': alarm_df['alarm_code']},
+    }]
+
+
+def alarm_figure(alarm_df):
+    return px.bar(alarm_df, y='count', color="alarm_code", text="alarm_code")
+
+
+def patch(traces):
+    """A Patch that replaces the given trace properties and leaves the rest of the figure alone."""
+    patched = Patch()
+
+    def assign(target, values):
+        for key, value in values.items():
+            if isinstance(value, dict):
+                assign(target[key], value)
+            else:
+                target[key] = value
+
+    for i, trace in enumerate(traces):
+        assign(patched['data'][i], trace)
+    return patched
@@ -0,0 +1,17 @@
+# gunicorn settings, picked up automatically from the working directory.
+#
+# With POD_PRELOAD=1 the app (and its memory-mapped data store) is imported
+# once in the master and shared with the workers through fork, instead of
+# every worker importing it on its own.
+
+import gc
+import os
+
+preload_app = os.environ.get('POD_PRELOAD') == '1'
+
+
+def when_ready(server):
+    # Keep the collector from touching (and so copying) the master's objects
+    # in every worker
+    if preload_app:
+        gc.freeze()
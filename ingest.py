@@ -0,0 +1,239 @@
+# Ingest stage: convert the MES workbooks under ./data into a columnar cache.
+#
+# Every sheet of a workbook is stored as an Arrow (feather) file under
+# ./cache, next to a small JSON manifest recording the workbook's mtime, size
+# and content hash. A later start only re-parses workbooks whose manifest no
+# longer matches the file on disk.
+#
+# Of a workbook that changed, only its newest day and new days are parsed
+# again (see _closed_sheets): a re-export that corrects an older day is not
+# picked up, nor by the rollups, OEE shifts and snapshots built from it.
+# After replacing such a workbook, rebuild the cache from scratch:
+#     python ingest.py --rebuild
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+
+import pandas as pd
+
+import xlsx
+
+DATA_DIR = os.environ.get('POD_DATA_DIR', './data')
+CACHE_DIR = os.environ.get('POD_CACHE_DIR', './cache')
+PROCESSES = int(os.environ.get('POD_INGEST_PROCESSES', '0')) or None
+KINDS = ('output', 'downtime', 'alarm', 'line')
+DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def discover(kind, data_dir=DATA_DIR):
+    """Return the sorted workbook paths under data/<kind>."""
+    return sorted(y for x in os.walk(os.path.join(data_dir, kind)) for y in glob(os.path.join(x[0], '*.xlsx')))
+
+
+def snapshot(data_dir=DATA_DIR):
+    """(mtime, size) of every workbook, to notice new or updated files cheaply."""
+    state = {}
+    for kind in KINDS:
+        for x in discover(kind, data_dir):
+            st = os.stat(x)
+            state[x] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+@contextmanager
+def locked(cache_dir=CACHE_DIR, name='.lock'):
+    """Hold an exclusive lock on the cache, so workers never rebuild it concurrently."""
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, name), 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def line_name(path):
+    # L1_output.xlsx -> L1; more than one digit so L10 and L1 stay apart
+    return re.search(r'L\d+', os.path.basename(path)).group(0)
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_path(path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(data_dir))
+    return os.path.join(cache_dir, os.path.splitext(rel)[0])
+
+
+def _read_manifest(base):
+    try:
+        with open(base + '.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(base, manifest):
+    tmp = base + '.json.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, base + '.json')
+
+
+def manifest(path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """The manifest the cache of path was last built with, without re-checking the file."""
+    return _read_manifest(cache_path(path, data_dir, cache_dir))
+
+
+def is_current(path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """Return the manifest of path if its cache is up to date, else None.
+
+    The mtime is checked first; when it moved but the content hash did not
+    (a copy, a touch) the manifest is refreshed instead of re-parsing.
+    """
+    base = cache_path(path, data_dir, cache_dir)
+    manifest = _read_manifest(base)
+    if manifest is None:
+        return None
+    st = os.stat(path)
+    if manifest['mtime_ns'] == st.st_mtime_ns and manifest['size'] == st.st_size:
+        return manifest
+    if manifest['sha1'] != file_hash(path):
+        return None
+    manifest['mtime_ns'], manifest['size'] = st.st_mtime_ns, st.st_size
+    _write_manifest(base, manifest)
+    return manifest
+
+
+def _normalise(df):
+    # Arrow needs one type per column; the exports sometimes mix ints into
+    # string columns (e.g. a 0 row in WORKCELL_STATUS).
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    df.columns = [str(c) for c in df.columns]
+    return df
+
+
+def _closed_sheets(manifest):
+    """Map the date-named sheets of an older build, except its newest day, to their index.
+
+    Sheets for a day that has closed are assumed never to change, so a
+    rebuild reuses them even though the workbook's hash moved; only the
+    newest day (still being written) and new days are parsed. Corrections
+    to a closed day need a full rebuild, see clear().
+    """
+    dated = [(DATE.search(name), i) for i, name in enumerate(manifest['sheets'])]
+    dates = [m.group(0) for m, _ in dated if m]
+    if not dates:
+        return {}
+    newest = max(dates)
+    return {manifest['sheets'][i]: i for m, i in dated if m and m.group(0) < newest}
+
+
+def build(path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """Parse the sheets of path (see xlsx.py) and (re)write its cache.
+
+    Closed-day sheets already in the cache (see _closed_sheets) are kept as
+    they are instead of being parsed again.
+    """
+    base = cache_path(path, data_dir, cache_dir)
+    st = os.stat(path)
+    names = xlsx.sheet_names(path)
+    old = _read_manifest(base)
+    reuse = _closed_sheets(old) if old else {}
+    sheets = xlsx.read_workbook(path, [n for n in names if n not in reuse])
+
+    tmp = base + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for i, name in enumerate(names):
+        target = os.path.join(tmp, f'{i}.feather')
+        if name in reuse:
+            shutil.copyfile(os.path.join(base, f'{reuse[name]}.feather'), target)
+        else:
+            _normalise(sheets[name]).to_feather(target, compression='uncompressed')
+    shutil.rmtree(base, ignore_errors=True)
+    os.replace(tmp, base)
+
+    manifest = {
+        'source': os.path.relpath(path, data_dir),
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'sha1': file_hash(path),
+        'sheets': names,
+    }
+    _write_manifest(base, manifest)
+    return manifest
+
+
+def load_workbook(path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """Return {sheet_name: DataFrame} for every sheet of path, in sheet order.
+
+    Reads from the columnar cache when it is current and rebuilds it first
+    when the workbook changed.
+    """
+    manifest = is_current(path, data_dir, cache_dir) or build(path, data_dir, cache_dir)
+    base = cache_path(path, data_dir, cache_dir)
+    return {name: pd.read_feather(os.path.join(base, f'{i}.feather')) for i, name in enumerate(manifest['sheets'])}
+
+
+def refresh(paths, processes=PROCESSES, data_dir=DATA_DIR, cache_dir=CACHE_DIR, progress=None):
+    """Rebuild the cache of every stale workbook in paths, one workbook per process.
+
+    Returns the paths that were rebuilt. Parsing is CPU bound (see xlsx.py),
+    so stale workbooks are fanned out over a process pool; the parent only
+    reads the resulting Arrow files afterwards. ``progress(done, total)`` is
+    called as workbooks finish.
+    """
+    stale = [p for p in paths if is_current(p, data_dir, cache_dir) is None]
+    progress = progress or (lambda done, total: None)
+    progress(0, len(stale))
+    workers = min(len(stale), processes or os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build, p, data_dir, cache_dir) for p in stale]
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                progress(done, len(stale))
+    else:
+        for done, p in enumerate(stale, 1):
+            build(p, data_dir, cache_dir)
+            progress(done, len(stale))
+    return stale
+
+
+def clear(cache_dir=CACHE_DIR):
+    """Remove everything built under cache_dir, so the next DataStore rebuilds it from the workbooks."""
+    with locked(cache_dir):
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif not name.endswith('.lock'):
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bring the workbook cache up to date.')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='discard the cache first, e.g. after an older day was re-exported')
+    args = parser.parse_args()
+    if args.rebuild:
+        clear()
+    from store import DataStore  # store imports this module
+    print(DataStore().lines)
@@ -0,0 +1,69 @@
+# Background loading of the first DataStore.
+#
+# Importing the app no longer waits for the workbooks to be parsed: a daemon
+# thread builds the store while the server already answers, with a loading
+# page (and a 503 from /readyz) until it is done. Progress is reported by
+# ingest.refresh per workbook and by DataStore per build stage.
+
+import threading
+import time
+import traceback
+
+from flask import jsonify
+
+RETRY_INTERVAL = 10
+
+
+class Loader(threading.Thread):
+    """Builds a store with ``build(progress)`` and hands it to ``on_ready``, retrying on failure."""
+
+    def __init__(self, build, on_ready, retry_interval=RETRY_INTERVAL):
+        super().__init__(name='pod-data-loader', daemon=True)
+        self.build = build
+        self.on_ready = on_ready
+        self.retry_interval = retry_interval
+        self.ready = threading.Event()
+        self.state = {'stage': 'Starting', 'done': 0, 'total': 0, 'error': None}
+
+    def progress(self, stage, done=0, total=0):
+        self.state = dict(self.state, stage=stage, done=done, total=total)
+
+    def run(self):
+        while True:
+            start = time.perf_counter()
+            try:
+                store = self.build(self.progress)
+            except Exception as e:
+                # Most likely a workbook that is still being written
+                traceback.print_exc()
+                self.state = dict(self.state, error=f'{type(e).__name__}: {e}')
+                time.sleep(self.retry_interval)
+                continue
+            self.on_ready(store)
+            self.state = dict(self.state, stage='Ready', error=None)
+            print(f'Loaded data in {time.perf_counter() - start:.1f}s')
+            self.ready.set()
+            return
+
+    def describe(self):
+        state = self.state
+        text = state['stage']
+        if state['total']:
+            text += f" ({state['done']}/{state['total']})"
+        if state['error']:
+            text += f" - retrying after error: {state['error']}"
+        return text
+
+
+def install(server, is_ready, describe):
+    """Add /healthz (the process is up) and /readyz (the data is loaded) for orchestrators."""
+
+    @server.route('/healthz')
+    def healthz():
+        return jsonify(status='ok')
+
+    @server.route('/readyz')
+    def readyz():
+        if is_ready():
+            return jsonify(status='ready')
+        return jsonify(status='loading', progress=describe()), 503
@@ -0,0 +1,146 @@
+# Latency instrumentation for the Dash callbacks.
+#
+# Every callback request is timed as a whole and by phase (data slicing,
+# table formatting, figure construction, and the remainder: Dash's dispatch
+# and JSON serialisation). The timings are exported as Prometheus histograms
+# on /metrics. With POD_PROFILE_SLOWEST=N each callback request also runs
+# under cProfile and the N slowest profiles are kept for /metrics/profiles.
+#
+# Metrics are per process; under gunicorn each worker reports its own.
+
+import cProfile
+import heapq
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_SLOWEST = int(os.environ.get('POD_PROFILE_SLOWEST', 0))
+CALLBACK_PATH = '/_dash-update-component'
+
+
+class Histogram:
+    """A Prometheus histogram with cumulative buckets, one series per label set."""
+
+    def __init__(self, name, help, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, (counts, total) in series:
+            label = ','.join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {total}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+REQUESTS = Histogram('pod_callback_seconds', 'Latency of Dash callback requests.', ('callback',))
+PHASES = Histogram('pod_callback_phase_seconds', 'Time spent per phase of a Dash callback request.', ('callback', 'phase'))
+
+_profiles = []
+_profiles_lock = threading.Lock()
+_sequence = itertools.count()
+
+
+def callback_name(body):
+    """Short label for a callback request: its output ids and properties."""
+    output = (body or {}).get('output', '')
+    return ','.join(o.split('@')[0] for o in output.strip('.').split('...')) or 'unknown'
+
+
+@contextmanager
+def phase(name):
+    """Time a block as one phase of the current callback request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'pod_phases' in g:
+            g.pod_phases[name] = g.pod_phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def _keep_profile(elapsed, callback, profile):
+    with _profiles_lock:
+        if len(_profiles) >= PROFILE_SLOWEST and elapsed <= _profiles[0][0]:
+            return
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(40)
+    with _profiles_lock:
+        entry = (elapsed, next(_sequence), callback, out.getvalue())
+        if len(_profiles) < PROFILE_SLOWEST:
+            heapq.heappush(_profiles, entry)
+        else:
+            heapq.heappushpop(_profiles, entry)
+
+
+def render():
+    return '\n'.join(REQUESTS.render() + PHASES.render()) + '\n'
+
+
+def install(server):
+    """Time every callback request and add the /metrics routes."""
+
+    @server.before_request
+    def start_timer():
+        if request.path != CALLBACK_PATH:
+            return
+        g.pod_callback = callback_name(request.get_json(silent=True))
+        g.pod_phases = {}
+        if PROFILE_SLOWEST > 0:
+            g.pod_profile = cProfile.Profile()
+            g.pod_profile.enable()
+        g.pod_start = time.perf_counter()
+
+    @server.after_request
+    def record_timer(response):
+        if 'pod_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.pod_start
+        if 'pod_profile' in g:
+            g.pod_profile.disable()
+            _keep_profile(elapsed, g.pod_callback, g.pod_profile)
+        REQUESTS.observe(elapsed, g.pod_callback)
+        for name, seconds in g.pod_phases.items():
+            PHASES.observe(seconds, g.pod_callback, name)
+        # Whatever the phases did not cover is Dash's dispatch and serialisation
+        PHASES.observe(max(elapsed - sum(g.pod_phases.values()), 0.0), g.pod_callback, 'serialise')
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    @server.route('/metrics/profiles')
+    def profiles():
+        if PROFILE_SLOWEST <= 0:
+            return Response('Profiling is off; set POD_PROFILE_SLOWEST=N to keep the N slowest requests.\n',
+                            mimetype='text/plain')
+        with _profiles_lock:
+            slowest = sorted(_profiles, reverse=True)
+        text = ''.join(f'==== {callback} {elapsed * 1000:.1f} ms ====\n{stats}\n' for elapsed, _, callback, stats in slowest)
+        return Response(text, mimetype='text/plain')
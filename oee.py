@@ -0,0 +1,269 @@
+# OEE (availability x performance x quality) per shift, line and workcell.
+#
+# The hours of the output and hourly downtime facts are bucketed into the
+# shifts of a calendar (POD_SHIFTS, or POD_SHIFTS_<line> for one line) with a
+# per-minute lookup table, so bucketing is a couple of array indexing steps.
+# Each (line, workcell, production day, shift) keeps only additive
+# components (planned and down seconds, parts in and out, the best hourly
+# rate) in cache/oee; the ratios are derived from them on read. A shift
+# crossing midnight belongs to the production day it starts on.
+#
+# The store is kept up to date like the rollups: only lines whose version
+# moved are touched, and of those only the shift days from the day before
+# the last one built, as closed days do not change (see
+# ingest._closed_sheets). A changed calendar rebuilds everything.
+#
+# Availability is the planned time (hours with output records) minus
+# downtime over planned time. Performance compares the parts processed with
+# what the ideal rate would have made in the run time; the ideal rate is
+# POD_OEE_IDEAL_RATE parts per hour, or else the 95th percentile of each
+# workcell's best hourly rate per shift. Quality is good parts (Output) over
+# parts processed (Input).
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import dash_table, dcc, html
+from dash.dependencies import Input, Output
+from plotly.subplots import make_subplots
+
+import controls
+import ingest
+import metrics
+import tables
+
+SHIFTS = os.environ.get('POD_SHIFTS', 'A=06:00-14:00,B=14:00-22:00,C=22:00-06:00')
+IDEAL_RATE = float(os.environ.get('POD_OEE_IDEAL_RATE', '0')) or None
+IDEAL_QUANTILE = 0.95
+# Hours that ran for less than this are left out of the best rate
+MIN_RUN_SECONDS = 1800
+COLUMNS = ['line', 'workcell', 'day', 'shift', 'hours', 'planned_seconds', 'downtime_seconds', 'input', 'output',
+           'peak_rate']
+RATIOS = ['availability', 'performance', 'quality', 'oee']
+SHIFT_COLUMNS = ['day', 'shift', 'hours', 'downtime_seconds', 'input', 'output'] + RATIOS
+
+
+class Calendar:
+    """The shifts of a production day, from a spec like 'A=06:00-14:00,B=14:00-22:00,C=22:00-06:00'."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.names = []
+        # Shift (-1: none) and production day offset of every minute of the day
+        self.shift = np.full(24 * 60, -1, dtype=np.int8)
+        self.offset = np.zeros(24 * 60, dtype='timedelta64[D]')
+        for i, part in enumerate(p.strip() for p in spec.split(',') if p.strip()):
+            name, hours = part.split('=')
+            start, end = (int(h) * 60 + int(m) for h, m in (t.split(':') for t in hours.split('-')))
+            self.names.append(name.strip())
+            minutes = np.arange(start, end if end > start else end + 24 * 60) % (24 * 60)
+            self.shift[minutes] = i
+            # Minutes past midnight of a shift that started the day before
+            self.offset[minutes[minutes < start]] = 1
+
+    @classmethod
+    def for_line(cls, line):
+        return cls(os.environ.get(f'POD_SHIFTS_{line}', SHIFTS))
+
+    def bucket(self, times):
+        """(production day, shift index) of each datetime64 value; shift -1 is outside every shift."""
+        times = np.asarray(times, dtype='datetime64[ns]')
+        days = times.astype('datetime64[D]')
+        minutes = ((times - days) // np.timedelta64(1, 'm')).astype(np.int64)
+        return (days - self.offset[minutes]).astype('datetime64[ns]'), self.shift[minutes]
+
+
+def _files(cache_dir):
+    base = os.path.join(cache_dir, 'oee')
+    return os.path.join(base, 'shifts.feather'), os.path.join(base, 'versions.json')
+
+
+def compute(output, hourly_downtime, calendars):
+    """Shift rows (COLUMNS) from long-form output and hourly downtime frames (facts.KEYS included).
+
+    ``calendars`` maps each line to its Calendar.
+    """
+    hours = output[['line', 'workcell', 'date', 'Createtime', 'Input', 'HourlyOutput']].astype({'line': str})
+    # Input is a running total per day; what went in during the hour is its difference
+    hours['input'] = hours.groupby(['line', 'workcell', 'date'])['Input'].diff().fillna(hours['Input']).clip(lower=0)
+    down = hourly_downtime[['line', 'workcell', 'Createtime', 'Total_seconds']].astype({'line': str})
+    hours = hours.merge(down, on=['line', 'workcell', 'Createtime'], how='left')
+    hours['downtime_seconds'] = hours['Total_seconds'].fillna(0).clip(0, 3600)
+    run_seconds = 3600 - hours['downtime_seconds']
+    hours['rate'] = (hours['input'] / (run_seconds / 3600)).where(run_seconds >= MIN_RUN_SECONDS)
+
+    day = np.empty(len(hours), dtype='datetime64[ns]')
+    shift = np.empty(len(hours), dtype=object)
+    for line, rows in hours.groupby('line').indices.items():
+        calendar = calendars[line]
+        day[rows], index = calendar.bucket(hours['Createtime'].to_numpy()[rows])
+        # Index -1 (no shift) picks the trailing None
+        shift[rows] = np.array(calendar.names + [None], dtype=object)[index]
+    hours['day'], hours['shift'] = day, shift
+
+    df = hours[hours['shift'].notna()].groupby(['line', 'workcell', 'day', 'shift'], as_index=False).agg(
+        hours=('Createtime', 'size'),
+        downtime_seconds=('downtime_seconds', 'sum'),
+        input=('input', 'sum'),
+        output=('HourlyOutput', 'sum'),
+        peak_rate=('rate', 'max'),
+    )
+    df['planned_seconds'] = df['hours'] * 3600
+    return df.astype({'workcell': np.int16, 'hours': np.int16, 'input': np.int64, 'output': np.int64})[COLUMNS]
+
+
+def ensure(fact_tables, versions, cache_dir=ingest.CACHE_DIR):
+    """Bring the shift store up to date with the fact tables and return it as a ShiftTable.
+
+    ``versions`` maps each line to the version of its data (DataStore.versions).
+    """
+    path, versions_path = _files(cache_dir)
+    calendars = {line: Calendar.for_line(line) for line in versions}
+    specs = hashlib.sha1(json.dumps({line: c.spec for line, c in sorted(calendars.items())}).encode()).hexdigest()
+    try:
+        with open(versions_path) as f:
+            stored = json.load(f)
+        current = pd.read_feather(path)
+    except (OSError, ValueError):
+        stored, current = {}, None
+    built = stored.get('lines', {}) if stored.get('calendars') == specs and current is not None else {}
+
+    stale = [line for line, version in versions.items() if built.get(line, {}).get('version') != version]
+    if stale or set(built) != set(versions):
+        output, hourly = fact_tables['output'], fact_tables['hourly_downtime']
+        parts = [] if not built else [current[current['line'].isin([line for line in versions if line not in stale])]]
+        lines = {line: built[line] for line in versions if line not in stale}
+        for line in stale:
+            # Redo the shifts from the day before the newest one built; the
+            # night shift of that day may have been cut short
+            through = built.get(line, {}).get('through')
+            cutoff = None if through is None else str(np.datetime64(through) - np.timedelta64(1, 'D'))
+            if cutoff is not None:
+                parts.append(current[(current['line'] == line) & (current['day'] < pd.Timestamp(cutoff))])
+            df = compute(output.select([line], start=cutoff).to_pandas(), hourly.select([line], start=cutoff).to_pandas(),
+                         calendars)
+            parts.append(df if cutoff is None else df[df['day'] >= pd.Timestamp(cutoff)])
+            dates = output.dates(line)
+            lines[line] = {'version': versions[line], 'through': dates[-1] if dates else through}
+        current = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=COLUMNS)
+        current = current.sort_values(['line', 'day', 'shift', 'workcell'], ignore_index=True)[COLUMNS]
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        current.to_feather(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        with open(versions_path + '.tmp', 'w') as f:
+            json.dump({'calendars': specs, 'lines': lines}, f)
+        os.replace(versions_path + '.tmp', versions_path)
+    return ShiftTable(current, calendars)
+
+
+def ratios(df):
+    """Adds availability, performance, quality and oee to rows holding the summed components and ``capacity``."""
+    run_seconds = df['planned_seconds'] - df['downtime_seconds']
+    return df.assign(
+        availability=run_seconds / df['planned_seconds'].where(df['planned_seconds'] > 0),
+        performance=(df['input'] / df['capacity'].where(df['capacity'] > 0)).clip(upper=1),
+        quality=df['output'] / df['input'].where(df['input'] > 0),
+    ).assign(oee=lambda d: d['availability'] * d['performance'] * d['quality'])
+
+
+class ShiftTable:
+    """The materialised shift rows, indexed by (line, day, shift) for lookups."""
+
+    def __init__(self, df, calendars):
+        self.calendars = calendars
+        if IDEAL_RATE:
+            ideal = pd.Series(IDEAL_RATE, index=pd.MultiIndex.from_frame(df[['line', 'workcell']].drop_duplicates()))
+        else:
+            ideal = df.groupby(['line', 'workcell'])['peak_rate'].quantile(IDEAL_QUANTILE)
+        self.ideal_rate = ideal
+        run_hours = (df['planned_seconds'] - df['downtime_seconds']) / 3600
+        df = df.assign(capacity=run_hours * ideal.reindex(pd.MultiIndex.from_frame(df[['line', 'workcell']])).to_numpy())
+        self.df = df.set_index(['line', 'day', 'shift']).sort_index()
+
+    def shifts(self, line):
+        return self.calendars[line].names if line in self.calendars else []
+
+    def lookup(self, line, day, shift, workcell=None):
+        """OEE of one shift: a dict of the summed components and ratios, or None when it has no data."""
+        try:
+            rows = self.df.loc[(line, pd.Timestamp(day), shift)]
+        except KeyError:
+            return None
+        if workcell is not None:
+            rows = rows[rows['workcell'] == workcell]
+            if rows.empty:
+                return None
+        return ratios(rows.drop(columns=['workcell', 'peak_rate']).sum().to_frame().T).iloc[0].to_dict()
+
+    def query(self, line, start=None, end=None, workcell=None):
+        """One row per (day, shift) of a line over an inclusive date range, for a workcell or all of them."""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        try:
+            rows = self.df.loc[(line, slice(start, end)), :]
+        except KeyError:
+            rows = self.df.iloc[:0]
+        if workcell is not None:
+            rows = rows[rows['workcell'] == workcell]
+        rows = rows.drop(columns=['workcell', 'peak_rate']).groupby(level=['day', 'shift']).sum()
+        df = ratios(rows).reset_index()
+        # Shifts in calendar order within a day
+        order = {name: i for i, name in enumerate(self.shifts(line))}
+        return df.sort_values(['day', 'shift'], key=lambda c: c.map(order) if c.name == 'shift' else c, ignore_index=True)
+
+
+def figure(df):
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("OEE per shift", "Availability, performance and quality"))
+    for shift, rows in df.groupby('shift', sort=False):
+        fig.add_trace(go.Bar(x=rows['day'], y=rows['oee'], name=f"Shift {shift}"), row=1, col=1)
+    daily = df.groupby('day', as_index=False)[['planned_seconds', 'downtime_seconds', 'input', 'output', 'capacity']].sum()
+    daily = ratios(daily)
+    for ratio in RATIOS[:3]:
+        fig.add_trace(go.Scatter(x=daily['day'], y=daily[ratio], name=ratio.capitalize(), mode='lines+markers'),
+                      row=2, col=1)
+    fig.update_layout(barmode='group')
+    fig.update_yaxes(tickformat='.0%', range=[0, 1.05])
+    return fig
+
+
+def table_records(df):
+    return df.assign(day=df['day'].dt.strftime('%Y-%m-%d'))[SHIFT_COLUMNS].to_dict('records')
+
+
+def layout(store):
+    return html.Div(children=[
+        controls.controls('oee', store),
+
+        dcc.Graph(id="oee_graph", style={"height": '700px'}),
+
+        dash_table.DataTable(
+            id='oee_table',
+            columns=tables.columns(SHIFT_COLUMNS),
+            page_size=21,
+        ),
+    ])
+
+
+def register(app, get_store):
+    """Add the OEE callbacks; ``get_store`` returns the current DataStore."""
+
+    @app.callback(
+        Output(component_id='oee_graph', component_property='figure'),
+        Output(component_id='oee_table', component_property='data'),
+        Input(component_id='oee_range', component_property='start_date'),
+        Input(component_id='oee_range', component_property='end_date'),
+        Input(component_id='oee_line', component_property='value'),
+        Input(component_id='oee_workcell', component_property='value')
+    )
+    def update_oee(start_date, end_date, line, workcell):
+        start, end, workcell = controls.selected(start_date, end_date, workcell)
+        with metrics.phase('slice'):
+            df = get_store().oee.query(line, start, end, workcell)
+        with metrics.phase('figure'):
+            return figure(df), table_records(df)
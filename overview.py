@@ -0,0 +1,101 @@
+# Plant overview: every line and workcell side by side for one date.
+#
+# The heatmaps are filled from the daily rollup (see rollups.py), which
+# already holds one grouped row per (line, workcell, day): a date costs a
+# single mask and one scatter of its rows into a lines x workcells grid,
+# rather than a slice per workcell.
+
+import numpy as np
+import plotly.graph_objects as go
+from dash import dcc, html
+from dash.dependencies import Input, Output
+from plotly.subplots import make_subplots
+
+import facts
+import metrics
+
+METRICS = (
+    ('output', 'Output'),
+    ('yield', 'Mean yield'),
+    ('downtime_minutes', 'Downtime in minutes'),
+)
+
+
+def layout(store):
+    dates = store.dates
+    return html.Div(children=[
+        html.Div(
+            children=[
+                html.Label('Date'),
+                dcc.Dropdown(
+                    id="overview_date",
+                    options=[{"label": f"{i}", "value": i} for i in dates],
+                    value=dates[-1],
+                    style={"marginTop": '10px'}
+                )
+            ],
+            style={"width": '33%', "padding": '10px'}
+        ),
+
+        dcc.Graph(id="overview_graph", style={"height": '600px'}),
+    ])
+
+
+def matrices(daily, date, lines):
+    """``{metric: lines x workcells array}`` for one date, NaN where a line has no data."""
+    df = daily[daily['period'] == np.datetime64(date, 'ns')]
+    rows = np.searchsorted(lines, df['line'].to_numpy())
+    found = (rows < len(lines)) & (np.asarray(lines)[np.minimum(rows, len(lines) - 1)] == df['line'].to_numpy())
+    rows, cols = rows[found], df['workcell'].to_numpy()[found] - 1
+    yield_count = df['yield_count'].to_numpy()[found]
+    values = {
+        'output': df['output'].to_numpy()[found],
+        'yield': np.where(yield_count > 0, df['yield_sum'].to_numpy()[found] / np.maximum(yield_count, 1), np.nan),
+        'downtime_minutes': np.round(df['downtime_seconds'].to_numpy()[found] / 60, 0),
+    }
+    result = {}
+    for metric, _ in METRICS:
+        grid = np.full((len(lines), facts.WORKCELLS), np.nan)
+        grid[rows, cols] = values[metric]
+        result[metric] = grid
+    return result
+
+
+def figure(grids, lines):
+    fig = make_subplots(rows=1, cols=len(METRICS), shared_yaxes=True, horizontal_spacing=0.08,
+                        subplot_titles=[title for _, title in METRICS])
+    workcells = [f"WC {i}" for i in range(1, facts.WORKCELLS + 1)]
+    for i, (metric, title) in enumerate(METRICS):
+        fig.add_trace(go.Heatmap(
+            z=grids[metric], x=workcells, y=lines, name=title,
+            colorscale='RdYlGn_r' if metric == 'downtime_minutes' else 'RdYlGn',
+            colorbar={'x': (i + 1) / len(METRICS) - 0.02, 'len': 0.9},
+            texttemplate='%{z:.1%}' if metric == 'yield' else '%{z:.0f}',
+            hovertemplate='%{y} %{x}<br>' + title + ': %{z}<extra></extra>',
+        ), row=1, col=i + 1)
+    fig.update_yaxes(autorange='reversed')
+    return fig
+
+
+def register(app, get_store):
+    """Add the overview callbacks; ``get_store`` returns the current DataStore."""
+
+    @app.callback(
+        Output(component_id='overview_graph', component_property='figure'),
+        Input(component_id='overview_date', component_property='value')
+    )
+    def update_overview_graph(overview_date):
+        store = get_store()
+        lines = sorted(store.lines)
+        with metrics.phase('slice'):
+            grids = matrices(store.rollups['daily'], overview_date, lines)
+        with metrics.phase('figure'):
+            return figure(grids, lines)
+
+    @app.callback(
+        Output(component_id='overview_date', component_property='options'),
+        Input(component_id='reload_interval', component_property='n_intervals'),
+        prevent_initial_call=True
+    )
+    def refresh_overview_dates(n_intervals):
+        return [{"label": f"{i}", "value": i} for i in get_store().dates]
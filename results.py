@@ -0,0 +1,71 @@
+# Memoized callback results.
+#
+# Historical days never change, so a callback's outputs for a given set of
+# inputs can be reused until the underlying workbook does. Results are stored
+# as serialised JSON in an in-process LRU and, when POD_RESULT_CACHE_DIR is
+# set and Flask-Caching is installed, in a FileSystemCache shared by every
+# worker on the host.
+
+import functools
+import json
+import os
+
+import plotly
+
+from store import LRUCache
+
+CACHE_BYTES = int(os.environ.get('POD_RESULT_CACHE_BYTES', 64 * 1024 * 1024))
+CACHE_DIR = os.environ.get('POD_RESULT_CACHE_DIR')
+
+
+class ResultCache:
+    def __init__(self, max_bytes=CACHE_BYTES, cache_dir=CACHE_DIR):
+        self.local = LRUCache(max_bytes, sizeof=len)
+        self.shared = None
+        if cache_dir:
+            try:
+                from flask_caching.backends import FileSystemCache
+            except ImportError:
+                print('Flask-Caching is not installed, POD_RESULT_CACHE_DIR is ignored')
+            else:
+                self.shared = FileSystemCache(cache_dir, threshold=0, default_timeout=0)
+
+    def get(self, key):
+        key = repr(key)
+        payload = self.local.get(key)
+        if payload is None and self.shared is not None:
+            payload = self.shared.get(key)
+            if payload is not None:
+                self.local.put(key, payload)
+        return None if payload is None else json.loads(payload)
+
+    def put(self, key, value):
+        """Store value under key as JSON and return it unchanged."""
+        key = repr(key)
+        payload = json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder)
+        self.local.put(key, payload)
+        if self.shared is not None:
+            self.shared.set(key, payload)
+        return value
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def memoize(self, version):
+        """Cache a callback by its arguments plus ``version(*args)``.
+
+        ``version`` should change whenever the data behind the arguments does,
+        so stale entries are never served after a workbook is updated.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                key = (func.__name__, args, version(*args))
+                cached = self.get(key)
+                if cached is None:
+                    cached = self.put(key, func(*args))
+                return cached
+            return wrapper
+        return decorator
@@ -0,0 +1,118 @@
+# Daily, weekly and monthly rollups per (line, workcell).
+#
+# Computed from the fact tables at ingest with one groupby per line, and
+# stored under cache/rollups. A rebuild only recomputes the daily rows of
+# lines whose workbooks changed; weeks and months are re-derived from the
+# (small) daily table. Trend views read these tables only, never the hourly
+# facts.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+GRANULARITIES = ('daily', 'weekly', 'monthly')
+COLUMNS = ['line', 'workcell', 'period', 'output', 'yield_sum', 'yield_count', 'downtime_seconds']
+
+
+def rollup_file(granularity, cache_dir=ingest.CACHE_DIR):
+    return os.path.join(cache_dir, 'rollups', f'{granularity}.feather')
+
+
+def _versions_file(cache_dir):
+    return os.path.join(cache_dir, 'rollups', 'versions.json')
+
+
+def daily(output, hourly_downtime):
+    """Daily rollup from long-form output and hourly downtime frames (facts.KEYS included)."""
+    out = output.groupby(['line', 'workcell', 'date'], observed=True).agg(
+        output=('HourlyOutput', 'sum'),
+        yield_sum=('Yield', 'sum'),
+        yield_count=('Yield', 'count'),
+    )
+    down = hourly_downtime.groupby(['line', 'workcell', 'date'], observed=True).agg(downtime_seconds=('Total_seconds', 'sum'))
+    df = out.join(down, how='outer').fillna(0).reset_index().rename(columns={'date': 'period'})
+    return df.astype({'line': str, 'output': np.int64, 'yield_count': np.int64})[COLUMNS]
+
+
+def period_start(days, granularity):
+    """First day of the day, week (Monday) or month each datetime64 value falls in."""
+    days = np.asarray(days).astype('datetime64[D]')
+    if granularity == 'weekly':
+        # 1970-01-01 was a Thursday
+        days = days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    elif granularity == 'monthly':
+        days = days.astype('datetime64[M]').astype('datetime64[D]')
+    return days.astype('datetime64[ns]')
+
+
+def coarsen(daily_df, granularity):
+    """Weekly or monthly rollup derived from the daily one."""
+    df = daily_df.assign(period=period_start(daily_df['period'].values, granularity))
+    return df.groupby(['line', 'workcell', 'period'], as_index=False)[COLUMNS[3:]].sum()[COLUMNS]
+
+
+def ensure(fact_tables, versions, cache_dir=ingest.CACHE_DIR):
+    """Bring the rollups up to date with the fact tables and return them by granularity.
+
+    ``versions`` maps each line to the version of its data
+    (DataStore.versions); only lines whose version moved are recomputed.
+    """
+    try:
+        with open(_versions_file(cache_dir)) as f:
+            stored = json.load(f)
+        current = pd.read_feather(rollup_file('daily', cache_dir))
+    except (OSError, ValueError):
+        stored, current = {}, None
+
+    stale = [line for line, version in versions.items() if stored.get(line) != version]
+    if stale or set(stored) != set(versions):
+        parts = []
+        if current is not None:
+            parts.append(current[current['line'].isin([line for line in versions if line not in stale])])
+        if stale:
+            parts.append(daily(
+                fact_tables['output'].select(lines=stale).to_pandas(),
+                fact_tables['hourly_downtime'].select(lines=stale).to_pandas(),
+            ))
+        current = pd.concat(parts, ignore_index=True).sort_values(['line', 'workcell', 'period'], ignore_index=True)
+
+        os.makedirs(os.path.dirname(rollup_file('daily', cache_dir)), exist_ok=True)
+        tables = {'daily': current}
+        tables.update({g: coarsen(current, g) for g in GRANULARITIES[1:]})
+        for granularity, df in tables.items():
+            path = rollup_file(granularity, cache_dir)
+            df.to_feather(path + '.tmp')
+            os.replace(path + '.tmp', path)
+        with open(_versions_file(cache_dir) + '.tmp', 'w') as f:
+            json.dump(versions, f)
+        os.replace(_versions_file(cache_dir) + '.tmp', _versions_file(cache_dir))
+        return tables
+
+    return {g: current if g == 'daily' else pd.read_feather(rollup_file(g, cache_dir)) for g in GRANULARITIES}
+
+
+def query(tables, granularity, line, workcell=None, start=None, end=None):
+    """Periods of one line overlapping two dates (inclusive), per workcell or summed over all of them.
+
+    ``tables`` is the dict returned by ensure(). Adds the mean ``yield`` and
+    ``downtime_minutes`` columns.
+    """
+    rollup = tables[granularity]
+    mask = rollup['line'] == line
+    if start is not None:
+        mask &= rollup['period'] >= period_start([pd.Timestamp(start).to_datetime64()], granularity)[0]
+    if end is not None:
+        mask &= rollup['period'] <= pd.Timestamp(end)
+    df = rollup[mask]
+    if workcell is None:
+        df = df.groupby('period', as_index=False)[COLUMNS[3:]].sum()
+    else:
+        df = df[df['workcell'] == workcell]
+    return df.assign(
+        **{'yield': df['yield_sum'] / df['yield_count'].where(df['yield_count'] > 0),
+           'downtime_minutes': np.round(df['downtime_seconds'] / 60, 0)}
+    )
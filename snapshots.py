@@ -0,0 +1,144 @@
+# Pre-rendered outputs of the daily detail view for closed days.
+#
+# A day is closed once a line has data for a later one; its rows no longer
+# change. With POD_SNAPSHOTS=1 every closed (line, date, workcell) is
+# rendered once after the data loads, over a process pool, into
+# cache/snapshots/<line>/<date>/ as gzipped JSON: the three figures' traces,
+# the first page of each table and the output table's columns. The file
+# name carries the day's digest (DataStore.day_version), so a snapshot that
+# is already current is skipped, and one whose day changed is never read.
+# The selection callbacks serve a closed day from its snapshot and build
+# only the current day (and sorted, filtered or paged tables) live.
+#
+# Can also be run ahead of time, e.g. in a deploy step:
+#     python snapshots.py
+
+import gzip
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+
+import plotly
+
+import facts
+import figures
+import ingest
+import tables
+from store import DataStore, LRUCache
+
+ENABLED = os.environ.get('POD_SNAPSHOTS') == '1'
+PROCESSES = int(os.environ.get('POD_SNAPSHOT_PROCESSES', '0')) or None
+# Decoded snapshots kept in memory, by the size of their JSON
+CACHE_BYTES = int(os.environ.get('POD_SNAPSHOT_CACHE_BYTES', 32 * 1024 * 1024))
+# Bump when render() changes, so older snapshots are not served
+FORMAT_VERSION = 1
+# The whole line first, as in the workcell dropdown
+WORKCELLS = [facts.LINE] + list(range(1, facts.WORKCELLS + 1))
+TABLES = {'data_table': 'output', 'downtime_table': 'downtime_breakdown', 'alarm_data_table': 'alarm'}
+
+
+def render(store, line, date, workcell):
+    """The selection outputs of one (line, date, workcell) as first shown, by component id."""
+    snapshot = {
+        'output_downtime_graph': figures.output_downtime_traces(store.slice('output', line, workcell, date),
+                                                                store.slice('hourly_downtime', line, workcell, date)),
+        'downtime_breakdown': figures.breakdown_traces(store.slice('downtime_breakdown', line, workcell, date)),
+        'alarm': figures.alarm_traces(store.slice('alarm', line, workcell, date)),
+        'data_table_columns': tables.columns(store.columns('output', line, workcell, date).keys()),
+    }
+    for component_id, kind in TABLES.items():
+        snapshot[component_id] = tables.page(store, kind, line, workcell, date, 0, tables.PAGE_SIZE, [], '')
+    return snapshot
+
+
+def first_page(page_current, page_size, sort_by, filter_query):
+    """Whether a table request is for the page a snapshot holds."""
+    return not page_current and page_size in (None, tables.PAGE_SIZE) and not sort_by and not filter_query
+
+
+def closed_days(store):
+    """(line, date) of every day before each line's newest one."""
+    return [(line, date) for line in store.lines for date in store.facts['output'].dates(line)[:-1]]
+
+
+class SnapshotStore:
+    def __init__(self, cache_dir=ingest.CACHE_DIR, max_bytes=CACHE_BYTES):
+        self.root = os.path.join(cache_dir, 'snapshots')
+        self.loaded = LRUCache(max_bytes)
+
+    def path(self, line, date, workcell, digest):
+        return os.path.join(self.root, line, date, f'{workcell}-v{FORMAT_VERSION}-{digest}.json.gz')
+
+    def get(self, store, line, date, workcell):
+        """The snapshot of (line, date, workcell) for the store's data, or None when there is none."""
+        path = self.path(line, date, workcell, store.day_version(line, date))
+        snapshot = self.loaded.get(path)
+        if snapshot is None:
+            try:
+                with open(path, 'rb') as f:
+                    payload = gzip.decompress(f.read())
+            except OSError:
+                return None
+            snapshot = json.loads(payload)
+            self.loaded.put(path, snapshot, size=len(payload))
+        return snapshot
+
+    def write(self, store, line, date):
+        """Render and store every workcell of (line, date), replacing snapshots of older data."""
+        digest = store.day_version(line, date)
+        os.makedirs(os.path.join(self.root, line, date), exist_ok=True)
+        for workcell in WORKCELLS:
+            path = self.path(line, date, workcell, digest)
+            payload = json.dumps(render(store, line, date, workcell), cls=plotly.utils.PlotlyJSONEncoder)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(gzip.compress(payload.encode(), compresslevel=6))
+            os.replace(path + '.tmp', path)
+            for old in glob(os.path.join(self.root, line, date, f'{workcell}-*.json.gz')):
+                if old != path:
+                    os.remove(old)
+
+    def missing(self, store):
+        """Closed days with at least one workcell lacking a current snapshot."""
+        return [(line, date) for line, date in closed_days(store)
+                if not all(os.path.exists(self.path(line, date, w, store.day_version(line, date))) for w in WORKCELLS)]
+
+
+_worker = {}
+
+
+def _start_worker(data_dir, cache_dir):
+    _worker['store'] = DataStore(data_dir, cache_dir)
+    _worker['snapshots'] = SnapshotStore(cache_dir)
+
+
+def _write_day(line, date):
+    _worker['snapshots'].write(_worker['store'], line, date)
+
+
+def warm(store, processes=PROCESSES):
+    """Write the snapshots of every closed day that lacks a current one; returns the number of days written.
+
+    Days are fanned out over a process pool, each worker opening its own
+    DataStore on the same cache; even with one worker this keeps the
+    rendering off the serving process' GIL and out of its slice cache. One
+    process at a time warms a cache.
+    """
+    snapshots = SnapshotStore(store.cache_dir)
+    start = time.perf_counter()
+    with ingest.locked(store.cache_dir, '.snapshots.lock'):
+        todo = snapshots.missing(store)
+        if todo:
+            workers = min(len(todo), processes or os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                     initargs=(store.data_dir, store.cache_dir)) as pool:
+                for future in as_completed([pool.submit(_write_day, line, date) for line, date in todo]):
+                    future.result()
+    if todo:
+        print(f'Rendered snapshots of {len(todo)} closed days in {time.perf_counter() - start:.1f}s')
+    return len(todo)
+
+
+if __name__ == '__main__':
+    warm(DataStore())
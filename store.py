@@ -0,0 +1,259 @@
+# Data-access layer behind the dashboard callbacks.
+#
+# Startup only maps the fact tables (see facts.py) and indexes their groups.
+# The frames for one (line, workcell, date) are converted to pandas the first
+# time they are asked for and kept in a byte-bounded LRU, so memory no longer
+# grows with the number of lines and days in ./data.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import alarms
+import facts
+import ingest
+import oee
+import rollups
+
+CACHE_BYTES = int(os.environ.get('POD_SLICE_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def frame_bytes(value):
+    """Deep memory footprint of a frame, or of the frames nested in a dict/list."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sum(frame_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(frame_bytes(v) for v in value)
+    return 0
+
+
+def to_columns(df):
+    """``{column: list}`` for df, with dates pre-rendered as ISO strings."""
+    columns = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            col = col.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        columns[str(name)] = col.tolist()
+    return columns
+
+
+def to_records(df):
+    """Like ``df.to_dict('records')`` but built column-wise from to_columns()."""
+    columns = to_columns(df)
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def default_dtypes(df):
+    """df with the dtypes pandas would give it by default: int64, float64 and object."""
+    dtypes = {}
+    for name, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[name] = object
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            dtypes[name] = np.int64
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[name] = np.float64
+    return df.astype(dtypes)
+
+
+def trim_categories(df):
+    """df without the categories it does not use.
+
+    Part of a fact table converts with the whole table's dictionary, which
+    for a small slice can outweigh the slice itself.
+    """
+    for name in df.columns[df.dtypes == 'category']:
+        df[name] = df[name].cat.remove_unused_categories()
+    return df
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by the total size of its values in bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES, sizeof=frame_bytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, size=None):
+        size = self.sizeof(value) if size is None else size
+        with self._lock:
+            if key in self._items:
+                self.bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.bytes += size
+            # Always keep the newest entry, even when it alone exceeds the budget
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                self.bytes -= self._items.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+# Kinds shipped to the browser in clientside mode, see bundle()
+BUNDLE_KINDS = ('output', 'hourly_downtime', 'downtime_breakdown', 'alarm')
+WORKCELLS = 10
+
+# Index each kind's slices the way the callbacks expect them
+INDEX = {
+    'output': 'Createtime',
+    'hourly_downtime': 'Createtime',
+    'downtime_breakdown': 'WORKCELL_STATUS',
+    'line_output': 'Createtime',
+}
+
+# Kinds with line-level rows, read when asked for workcell facts.LINE
+LINE_KINDS = {'output': 'line_output'}
+
+
+class DataStore:
+    """Lazily materialised view of the output, downtime and alarm fact tables.
+
+    ``slice(kind, line, workcell, date)`` returns one (line, workcell, date)
+    of a kind from facts.KINDS as a DataFrame; workcells are numbered from 1,
+    and workcell facts.LINE is the whole line (empty for kinds without
+    line-level data).
+    """
+
+    def __init__(self, data_dir=ingest.DATA_DIR, cache_dir=ingest.CACHE_DIR, max_bytes=CACHE_BYTES, progress=None):
+        # progress(stage, done, total) is told how far the build got, see loading.py
+        progress = progress or (lambda stage, done=0, total=0: None)
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir
+        self.snapshot = ingest.snapshot(data_dir)
+        self.files = {kind: {ingest.line_name(x): x for x in ingest.discover(kind, data_dir)} for kind in ingest.KINDS}
+        progress('Waiting for the cache lock')
+        with ingest.locked(cache_dir):
+            ingest.refresh([x for files in self.files.values() for x in files.values()], data_dir=data_dir, cache_dir=cache_dir,
+                           progress=lambda done, total: progress('Reading workbooks', done, total))
+            progress('Building fact tables')
+            facts.ensure(self.files, data_dir, cache_dir)
+
+            # Fact tables are memory-mapped, not copied: their buffers point
+            # into the page cache, so every worker mapping the same file
+            # shares one physical copy
+            self.facts = {kind: facts.FactTable.open(kind, cache_dir) for kind in facts.KINDS}
+
+            # A line's version changes whenever one of its workbooks does
+            self.versions = {}
+            for line in self.files['output']:
+                h = hashlib.sha1()
+                for kind in ingest.KINDS:
+                    if line in self.files[kind]:
+                        h.update(ingest.manifest(self.files[kind][line], data_dir, cache_dir)['sha1'].encode())
+                self.versions[line] = h.hexdigest()[:12]
+
+            # Small enough to keep in memory as plain frames
+            progress('Building rollups')
+            self.rollups = rollups.ensure(self.facts, self.versions, cache_dir)
+            progress('Building OEE shifts')
+            self.oee = oee.ensure(self.facts, self.versions, cache_dir)
+            self.alarm_codes = alarms.AlarmCodes.load(data_dir, cache_dir)
+
+        self.slices = LRUCache(max_bytes)
+
+    @property
+    def lines(self):
+        return list(self.files['output'])
+
+    @property
+    def dates(self):
+        """Dates with output data for the first line, as YYYY-MM-DD strings."""
+        return self.facts['output'].dates(self.lines[0]) if self.lines else []
+
+    def version(self, line):
+        return self.versions[line]
+
+    def day_version(self, line, date):
+        """Digest of one line's data for one date; unlike version() it only moves when that day's rows do."""
+        return hashlib.sha1(''.join(self.facts[kind].day_digests().get((line, date), '')
+                                    for kind in facts.KINDS).encode()).hexdigest()[:12]
+
+    def slice(self, kind, line, workcell, date):
+        if workcell == facts.LINE:
+            kind = LINE_KINDS.get(kind, kind)
+        key = (kind, line, workcell, date)
+        df = self.slices.get(key)
+        if df is None:
+            df = trim_categories(self.facts[kind].slice(line, workcell, date).to_pandas())
+            if INDEX.get(kind) in df:
+                df = df.set_index(INDEX[kind])
+            self.slices.put(key, df)
+        return df
+
+    def frame(self, kind, line, workcell, date):
+        """The slice with its index as a column, the way the tables show it."""
+        df = self.slice(kind, line, workcell, date)
+        return df.reset_index() if df.index.name is not None else df
+
+    def records(self, kind, line, workcell, date):
+        """The slice as DataTable records, built once and then shared by every request."""
+        key = ('records', kind, line, workcell, date)
+        records = self.slices.get(key)
+        if records is None:
+            df = self.frame(kind, line, workcell, date)
+            records = to_records(df)
+            # Rough size of the dicts and boxed values; deep-measuring them would cost more than building them
+            self.slices.put(key, records, size=len(records) * (len(df.columns) + 2) * 64)
+        return records
+
+    def order(self, kind, line, workcell, date, column, ascending=True):
+        """Positions of the records sorted by column (stable, missing values last), built once per slice."""
+        key = ('order', kind, line, workcell, date, column, ascending)
+        positions = self.slices.get(key)
+        if positions is None:
+            df = self.frame(kind, line, workcell, date)
+            values = df[column] if column in df else pd.Series(range(len(df)))
+            positions = values.reset_index(drop=True).sort_values(ascending=ascending, kind='mergesort').index.to_numpy()
+            self.slices.put(key, positions, size=positions.nbytes)
+        return positions
+
+    def columns(self, kind, line, workcell, date):
+        """The slice as ``{column: list}``, index included, for shipping to the browser."""
+        return to_columns(self.frame(kind, line, workcell, date))
+
+    def memory_report(self):
+        """Deep pandas footprint of each (line, kind), with pandas' default dtypes and with the stored ones.
+
+        ``bytes_before`` is what the frames took before facts.compact()
+        (int64, float64 and object columns), ``bytes_after`` what they take now.
+        """
+        rows = []
+        for kind, table in self.facts.items():
+            for line in table.lines():
+                df = trim_categories(table.select(lines=[line], keys=False).to_pandas())
+                rows.append({'line': line, 'kind': kind, 'rows': len(df),
+                             'bytes_before': frame_bytes(default_dtypes(df)), 'bytes_after': frame_bytes(df)})
+        report = pd.DataFrame(rows, columns=['line', 'kind', 'rows', 'bytes_before', 'bytes_after'])
+        report['ratio'] = report['bytes_before'] / report['bytes_after']
+        return report
+
+    def bundle(self, line, date):
+        """Every workcell's slices for one (line, date) as columnar JSON, workcell 1 first, plus the whole line."""
+        return {'workcells': [{kind: self.columns(kind, line, workcell, date) for kind in BUNDLE_KINDS}
+                              for workcell in range(1, WORKCELLS + 1)],
+                'line': {kind: self.columns(kind, line, facts.LINE, date) for kind in BUNDLE_KINDS}}
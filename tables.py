@@ -0,0 +1,171 @@
+# Column specs for the dashboard's DataTables.
+#
+# Tables receive raw numbers; percentages are formatted by the browser
+# through the DataTable format spec instead of per cell on the server.
+
+import math
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+from dash.dash_table import FormatTemplate
+
+PERCENT_COLUMNS = ('NGRate', 'Yield', 'YieldWithoutSample', 'share', 'cumulative_share',
+                   'availability', 'performance', 'quality', 'oee')
+
+
+def columns(names):
+    specs = []
+    for i in names:
+        spec = {"name": i, "id": i}
+        if i in PERCENT_COLUMNS:
+            spec.update(type='numeric', format=FormatTemplate.percentage(2))
+        specs.append(spec)
+    return specs
+
+
+# Server-side paging, sorting and filtering (page_action='custom' etc.)
+
+PAGE_SIZE = 25
+COMPARISONS = {
+    'ge': operator.ge, 'le': operator.le, 'lt': operator.lt,
+    'gt': operator.gt, 'ne': operator.ne, 'eq': operator.eq,
+}
+SYMBOLS = {'>=': 'ge', '<=': 'le', '<': 'lt', '>': 'gt', '!=': 'ne', '=': 'eq'}
+# Operators of the DataTable filter syntax handled here; each also comes
+# with an "i" (case-insensitive) and "s" (case-sensitive, the default) prefix
+FILTER_OPERATORS = (*COMPARISONS, 'contains', 'datestartswith')
+UNARY_OPERATORS = ('is blank', 'is nil')
+# One "{column} operator value" clause: the operator is read right after the
+# column, so operator names inside the value are just text
+FILTER_CLAUSE = re.compile(r"""
+    \{(?P<column>(?:[^}\\]|\\.)*)\}\s*
+    (?:(?P<unary>is\s+\w+)
+      |(?P<op>[is]?(?:[<>!]=|[<>=])|[a-z]+)\s*
+       (?P<value>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`|[^\s"'`]+))
+    \s*""", re.VERBOSE)
+FILTER_AND = re.compile(r'&&\s*')
+
+
+def actions(custom):
+    """DataTable paging/sorting/filtering props, done by the server when custom."""
+    action = 'custom' if custom else 'native'
+    return dict(page_action=action, sort_action=action, filter_action=action,
+                sort_mode='single', page_current=0, page_size=PAGE_SIZE)
+
+
+def split_filter_part(part):
+    """(column, operator, value) of one ``{column} op value`` clause of a filter_query.
+
+    Operators are returned by name ("ge" for ">="), with an "i" prefix when
+    case-insensitive; unary ones ("is blank") have a value of None. Raises
+    ValueError for a clause that is malformed or uses an unsupported operator.
+    """
+    clauses = split_filter(part)
+    if len(clauses) != 1:
+        raise ValueError(f'not a single filter clause: {part!r}')
+    return clauses[0]
+
+
+def split_filter(filter_query):
+    """The (column, operator, value) clauses of a filter_query joined by ``&&``."""
+    clauses, position = [], 0
+    while True:
+        match = FILTER_CLAUSE.match(filter_query, position)
+        if match is None:
+            raise ValueError(f'unsupported filter: {filter_query[position:]!r}')
+        clauses.append(_clause(match))
+        position = match.end()
+        if position == len(filter_query):
+            return clauses
+        separator = FILTER_AND.match(filter_query, position)
+        if separator is None:
+            raise ValueError(f'unsupported filter: {filter_query[position:]!r}')
+        position = separator.end()
+
+
+def _clause(match):
+    column = re.sub(r'\\(.)', r'\1', match.group('column'))
+    if match.group('unary'):
+        op = ' '.join(match.group('unary').split())
+        if op not in UNARY_OPERATORS:
+            raise ValueError(f'unsupported filter operator: {op!r}')
+        return column, op, None
+    # The DataTable's filter row prefixes symbols too ("s>" for "> 100")
+    op, prefix = match.group('op'), ''
+    if op not in SYMBOLS and op not in FILTER_OPERATORS and op[:1] in ('i', 's'):
+        prefix, op = op[0], op[1:]
+    op = SYMBOLS.get(op, op)
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f'unsupported filter operator: {prefix + op!r}')
+    if prefix == 'i':
+        op = 'i' + op
+    value = match.group('value')
+    if value[:1] in ('"', "'", '`'):
+        value = re.sub(r'\\(.)', r'\1', value[1:-1])
+    return column, op, value
+
+
+def filter_mask(df, filter_query):
+    """Boolean array of the rows of df matching a DataTable filter_query.
+
+    A query that cannot be parsed matches no rows; clauses on columns df
+    does not have are ignored.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    try:
+        clauses = split_filter(filter_query)
+    except ValueError:
+        return ~mask
+    for column, op, value in clauses:
+        if column not in df:
+            continue
+        col = df[column]
+        ignore_case = op.startswith('i') and op not in UNARY_OPERATORS
+        op = op[1:] if ignore_case else op
+        if op in UNARY_OPERATORS:
+            matched = col.isna()
+            if op == 'is blank' and not pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_datetime64_any_dtype(col):
+                matched |= col.astype(str).str.strip() == ''
+        elif op in ('contains', 'datestartswith'):
+            text = col.dt.strftime('%Y-%m-%dT%H:%M:%S') if pd.api.types.is_datetime64_any_dtype(col) else col.astype(str)
+            if ignore_case:
+                text, value = text.str.lower(), value.lower()
+            matched = text.str.contains(value, regex=False) if op == 'contains' else text.str.startswith(value)
+        else:
+            try:
+                if pd.api.types.is_bool_dtype(col):
+                    value = value.lower() == 'true'
+                elif pd.api.types.is_datetime64_any_dtype(col):
+                    value = pd.Timestamp(value)
+                elif pd.api.types.is_numeric_dtype(col):
+                    value = float(value)
+                else:
+                    col = col.astype(str)
+                    if ignore_case:
+                        col, value = col.str.lower(), value.lower()
+                matched = COMPARISONS[op](col, value)
+            except (TypeError, ValueError):
+                matched = pd.Series(False, index=col.index)
+        mask &= matched.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def page(store, kind, line, workcell, date, page_current, page_size, sort_by, filter_query):
+    """One page of a slice's records, after sorting and filtering, and the page count.
+
+    The records and each column's ordering are built once per slice (see
+    DataStore.records and DataStore.order), so a page costs an index lookup.
+    """
+    records = store.records(kind, line, workcell, date)
+    if sort_by:
+        positions = store.order(kind, line, workcell, date, sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc')
+    else:
+        positions = np.arange(len(records))
+    if filter_query:
+        positions = positions[filter_mask(store.frame(kind, line, workcell, date), filter_query)[positions]]
+    page_size = page_size or PAGE_SIZE
+    page_count = max(math.ceil(len(positions) / page_size), 1)
+    start = min(page_current or 0, page_count - 1) * page_size
+    return [records[i] for i in positions[start:start + page_size]], page_count
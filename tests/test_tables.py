@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import tables
+
+
+@pytest.mark.parametrize('part, expected', [
+    ('{alarm} contains "voltage low"', ('alarm', 'contains', 'voltage low')),
+    ('{alarm} contains "le lt ge"', ('alarm', 'contains', 'le lt ge')),
+    ('{alarm} icontains "Voltage"', ('alarm', 'icontains', 'Voltage')),
+    ('{alarm} scontains Voltage', ('alarm', 'contains', 'Voltage')),
+    ('{Output} >= 10', ('Output', 'ge', '10')),
+    ('{Output} ge 10', ('Output', 'ge', '10')),
+    ('{Output} < 3.5', ('Output', 'lt', '3.5')),
+    ('{Output} != 0', ('Output', 'ne', '0')),
+    ('{HourlyOutput} s> 100', ('HourlyOutput', 'gt', '100')),
+    ('{Yield} s= 0.9', ('Yield', 'eq', '0.9')),
+    ('{Output} i<= 10', ('Output', 'ile', '10')),
+    ('{Output} s!= 0', ('Output', 'ne', '0')),
+    ('{Output} s>=5', ('Output', 'ge', '5')),
+    ('{WORKCELL_STATUS} = alarming', ('WORKCELL_STATUS', 'eq', 'alarming')),
+    ('{WORKCELL_STATUS} ieq "Alarming"', ('WORKCELL_STATUS', 'ieq', 'Alarming')),
+    ('{Createtime} datestartswith 2021-12-05', ('Createtime', 'datestartswith', '2021-12-05')),
+    ("{alarm} contains 'it\\'s'", ('alarm', 'contains', "it's")),
+    ('{alarm} is blank', ('alarm', 'is blank', None)),
+    ('{alarm} is nil', ('alarm', 'is nil', None)),
+])
+def test_split_filter_part(part, expected):
+    assert tables.split_filter_part(part) == expected
+
+
+@pytest.mark.parametrize('part', ['{Output} is prime', '{Output} between 1', '{Output} x> 1', '{Output} ss> 1', 'Output > 1', '{Output} >', ''])
+def test_split_filter_part_rejects(part):
+    with pytest.raises(ValueError):
+        tables.split_filter_part(part)
+
+
+def test_split_filter_keeps_separators_inside_values():
+    assert tables.split_filter('{alarm} contains "a && b" && {Output} > 1') == [
+        ('alarm', 'contains', 'a && b'), ('Output', 'gt', '1')]
+
+
+@pytest.fixture
+def alarms():
+    return pd.DataFrame({
+        'alarm': ['Voltage low', 'voltage low on feeder', 'Carrier jam', None, ''],
+        'count': [3, 1, 7, 2, 5],
+    })
+
+
+@pytest.mark.parametrize('query, rows', [
+    ('{alarm} contains "voltage low"', [1]),
+    ('{alarm} icontains "voltage low"', [0, 1]),
+    ('{alarm} is blank', [3, 4]),
+    ('{alarm} is nil', [3]),
+    ('{count} >= 3', [0, 2, 4]),
+    ('{count} s> 3', [2, 4]),
+    ('{count} s= 5', [4]),
+    ('{alarm} i= "carrier JAM"', [2]),
+    ('{alarm} icontains voltage && {count} > 1', [0]),
+    ('{alarm} ieq "carrier jam"', [2]),
+    ('{missing} > 1', [0, 1, 2, 3, 4]),
+    ('{count} is prime', []),
+])
+def test_filter_mask(alarms, query, rows):
+    assert list(alarms.index[tables.filter_mask(alarms, query)]) == rows
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import xlsx
+
+
+def test_ragged_rows_leave_missing_cells_empty():
+    df = xlsx._frame(iter([('a', 'Input', 'Yield'), ('x', 0), ('x', 1)]), None)
+    assert list(df.columns) == ['a', 'Input', 'Yield']
+    assert df['Input'].tolist() == [0, 1]
+    assert df['Yield'].isna().all()
+
+
+def test_ragged_rows_within_a_chunk():
+    rows = [('Createtime', 'Output', 'Note'), (pd.Timestamp('2021-12-01 06:00'), 5, 'ok'), (pd.Timestamp('2021-12-01 07:00'),)]
+    df = xlsx._frame(iter(rows), len(rows))
+    assert df['Output'].iloc[0] == 5 and np.isnan(df['Output'].iloc[1])
+    assert df['Note'].iloc[0] == 'ok' and pd.isna(df['Note'].iloc[1])
+
+
+def test_ragged_rows_across_chunks(monkeypatch):
+    monkeypatch.setattr(xlsx, 'CHUNK_ROWS', 2)
+    rows = [('a', 'b', 'c'), (1, 2, 3), (4, 5, 6), (7,), (8,)]
+    df = xlsx._frame(iter(rows), None)
+    assert df['a'].tolist() == [1, 4, 7, 8]
+    assert df['c'].iloc[:2].tolist() == [3, 6] and df['c'].iloc[2:].isna().all()
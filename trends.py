@@ -0,0 +1,56 @@
+# Trend view: output, yield and downtime over a date range.
+#
+# Reads only the daily/weekly/monthly rollups (see rollups.py), so a range of
+# months costs the same as a range of days.
+
+import plotly.graph_objects as go
+from dash import dcc, html
+from dash.dependencies import Input, Output
+from plotly.subplots import make_subplots
+
+import controls
+import metrics
+import rollups
+
+
+def layout(store):
+    return html.Div(children=[
+        controls.controls('trend', store, controls.labelled('Granularity', dcc.RadioItems(
+            id="trend_granularity",
+            options=[{"label": g.capitalize(), "value": g} for g in rollups.GRANULARITIES],
+            value='daily',
+            style={"marginTop": '10px'}
+        ))),
+
+        dcc.Graph(id="trend_graph", style={"height": '800px'}),
+    ])
+
+
+def figure(df):
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=("Output", "Mean yield", "Downtime in minutes"))
+    fig.add_trace(go.Bar(x=df['period'], y=df['output'], name="Output"), row=1, col=1)
+    fig.add_trace(go.Scatter(x=df['period'], y=df['yield'], name="Yield", mode='lines+markers'), row=2, col=1)
+    fig.add_trace(go.Bar(x=df['period'], y=df['downtime_minutes'], name="Downtime"), row=3, col=1)
+    fig.update_yaxes(tickformat='.1%', row=2, col=1)
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def register(app, get_store):
+    """Add the trend callbacks; ``get_store`` returns the current DataStore."""
+
+    @app.callback(
+        Output(component_id='trend_graph', component_property='figure'),
+        Input(component_id='trend_range', component_property='start_date'),
+        Input(component_id='trend_range', component_property='end_date'),
+        Input(component_id='trend_granularity', component_property='value'),
+        Input(component_id='trend_line', component_property='value'),
+        Input(component_id='trend_workcell', component_property='value')
+    )
+    def update_trend_graph(start_date, end_date, granularity, line, workcell):
+        start, end, workcell = controls.selected(start_date, end_date, workcell)
+        with metrics.phase('slice'):
+            df = rollups.query(get_store().rollups, granularity, line, workcell, start, end)
+        with metrics.phase('figure'):
+            return figure(df)
@@ -0,0 +1,73 @@
+# Background reloading of the data store when new workbooks land in ./data.
+#
+# The MES exports overwrite Lx_output/Lx_downtime/Lx_alarm workbooks during
+# the day. A daemon thread polls their mtimes and, when something changed,
+# builds a fresh DataStore (re-parsing only the changed workbooks, see
+# ingest.build) while requests keep being served from the current one. The
+# new store is then handed over in a single assignment.
+
+import os
+import threading
+import time
+import traceback
+
+import ingest
+
+INTERVAL = float(os.environ.get('POD_RELOAD_INTERVAL', '60'))
+
+
+class Watcher(threading.Thread):
+    def __init__(self, on_change, last, interval=INTERVAL, data_dir=ingest.DATA_DIR):
+        super().__init__(name='pod-data-watcher', daemon=True)
+        self.on_change = on_change
+        self.interval = interval
+        self.data_dir = data_dir
+        self.last = last
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        current = ingest.snapshot(self.data_dir)
+        if current == self.last:
+            return False
+        start = time.perf_counter()
+        try:
+            self.on_change()
+        except Exception:
+            # Most likely a workbook that is still being written; the
+            # snapshot is kept so the next poll tries again
+            traceback.print_exc()
+            return False
+        self.last = current
+        print(f'Reloaded data in {time.perf_counter() - start:.1f}s')
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def install(server, on_change, snapshot, interval=INTERVAL):
+    """Start a Watcher in each serving process when it handles its first request.
+
+    Threads do not survive gunicorn's fork, so starting the watcher at import
+    would leave preloaded workers without one. ``snapshot`` returns the
+    workbook state the current data was built from, or None while the first
+    store is still loading, in which case a later request tries again.
+    """
+    if interval <= 0:
+        return
+    started = {}
+    lock = threading.Lock()
+
+    @server.before_request
+    def start_watcher():
+        if started.get('pid') == os.getpid():
+            return
+        with lock:
+            last = snapshot()
+            if started.get('pid') != os.getpid() and last is not None:
+                Watcher(on_change, last, interval).start()
+                started['pid'] = os.getpid()
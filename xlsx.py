@@ -0,0 +1,188 @@
+# Streaming reader for the MES workbooks.
+#
+# pd.read_excel builds a cell object model per sheet and infers each column's
+# type row by row. This reader streams rows as plain values, with calamine
+# (python-calamine) when it is installed and openpyxl's read-only mode
+# otherwise, and copies them a chunk at a time into preallocated NumPy arrays.
+# Columns of the known sheet schemas (DTYPES) get their type up front, so
+# Createtime lands directly in a datetime64 array and the counters in
+# numeric ones; other columns are inferred once per column at the end.
+# Frames come out like pd.read_excel's: first row as header, blank rows
+# dropped, NaN for empty cells.
+
+import os
+from itertools import islice, zip_longest
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+ENGINE = os.environ.get('POD_XLSX_ENGINE') or ('calamine' if CalamineWorkbook is not None else 'openpyxl')
+CHUNK_ROWS = 4096
+
+# Columns of the output, downtime, alarm and line exports with a known type.
+# Integer columns with empty cells stay float64, as with read_excel
+DTYPES = {
+    'Createtime': 'datetime64[ns]',
+    **dict.fromkeys(['MachineNO', 'Input', 'Output', 'Sampling', 'OK', 'NGQty', 'Others', 'HourlyOutput',
+                     'HourlyInput', 'WORKCELL', 'alarm_code', 'count'], 'int64'),
+    **dict.fromkeys(['NGRate', 'Yield', 'YieldWithoutSample', 'Sample', 'Total_seconds'], 'float64'),
+}
+# Text read as a missing value, as read_excel does (Excel's error values included)
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null']
+# Day 0 of Excel's (1900) date serials, for dates stored as plain numbers
+EXCEL_EPOCH = np.datetime64('1899-12-30', 'ns')
+
+
+def sheet_names(path, engine=None):
+    if (engine or ENGINE) == 'calamine':
+        return CalamineWorkbook.from_path(path).sheet_names
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def read_workbook(path, sheets=None, engine=None):
+    """Return {sheet_name: DataFrame} for the given sheets of path (all by default), in sheet order."""
+    if (engine or ENGINE) == 'calamine':
+        wb = CalamineWorkbook.from_path(path)
+        names = [n for n in wb.sheet_names if sheets is None or n in sheets]
+        frames = {}
+        for name in names:
+            rows = wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+            frames[name] = _frame(iter(rows), len(rows))
+        return frames
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        names = [n for n in wb.sheetnames if sheets is None or n in sheets]
+        # max_row comes from the sheet's dimension record and may be missing
+        return {name: _frame(wb[name].iter_rows(values_only=True), wb[name].max_row) for name in names}
+    finally:
+        wb.close()
+
+
+def _header(row):
+    # Named the way read_excel names them: Unnamed: <i> for blanks, .1, .2 for repeats
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f'Unnamed: {i}' if value is None or value == '' else value
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _storage(name):
+    dtype = DTYPES.get(name)
+    return np.dtype('float64') if dtype == 'int64' else np.dtype(dtype or object)
+
+
+def _frame(rows, max_rows=None):
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = _header(header)
+    size = max(max_rows - 1, 0) if max_rows else CHUNK_ROWS
+    arrays = [np.empty(size, dtype=_storage(name)) for name in columns]
+
+    filled = 0
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+        stop = filled + len(chunk)
+        if stop > size:
+            size = max(stop, 2 * size)
+            arrays = [np.resize(a, size) for a in arrays]
+        # Rows may be shorter than the header (openpyxl without a dimension
+        # record): columns past the longest row of the chunk are empty
+        width = 0
+        for j, values in enumerate(islice(zip_longest(*chunk), len(columns))):
+            width = j + 1
+            try:
+                arrays[j][filled:stop] = values
+            except (TypeError, ValueError):
+                # Not what the schema says (text in a counter, dates as
+                # numbers): keep the raw values and infer this column instead
+                arrays[j] = arrays[j].astype(object)
+                arrays[j][filled:stop] = values
+        for a in arrays[width:]:
+            a[filled:stop] = None
+        filled = stop
+
+    df = pd.DataFrame({name: _column(name, a[:filled]) for name, a in zip(columns, arrays)}, columns=columns)
+    blank = df.isna().all(axis=1)
+    if blank.any():
+        df = df[~blank.to_numpy()].reset_index(drop=True)
+    # Trailing columns with neither a header nor values are padding
+    while len(df.columns) and str(df.columns[-1]).startswith('Unnamed: ') and df[df.columns[-1]].isna().all():
+        df = df.iloc[:, :-1]
+    return df
+
+
+def _column(name, values):
+    dtype = DTYPES.get(name)
+    if values.dtype == object:
+        # calamine reads empty cells as ''
+        values = np.where(pd.Series(values).isin(NA_VALUES).to_numpy(), None, values)
+        if dtype is None:
+            return _infer(values)
+        try:
+            values = values.astype(_storage(name))
+        except (TypeError, ValueError):
+            return _datetimes(values) if dtype == 'datetime64[ns]' else _infer(values)
+    if dtype == 'int64' and not np.isnan(values).any() and (values == np.floor(values)).all():
+        return values.astype(np.int64)
+    return values
+
+
+def _datetimes(values):
+    # Excel serials (days since EXCEL_EPOCH) are converted in one go; the
+    # rest (datetimes, ISO strings) by pandas
+    serial = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy()
+    is_serial = ~np.isnan(serial)
+    out = pd.to_datetime(pd.Series(np.where(is_serial, None, values)), errors='coerce').to_numpy()
+    out[is_serial] = EXCEL_EPOCH + np.round(serial[is_serial] * 86400e9).astype('timedelta64[ns]')
+    return out
+
+
+def _infer(values):
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    missing = pd.isna(values)
+    if kind == 'empty':
+        return np.full(len(values), np.nan)
+    if kind in ('string', 'mixed-integer', 'mixed-integer-float', 'mixed'):
+        # Like read_excel, numbers stored as text are read as numbers
+        try:
+            values = pd.to_numeric(values).astype(object)
+            kind = 'floating'
+        except (TypeError, ValueError):
+            # Text mixed with numbers: whole ones are ints for read_excel,
+            # floats for calamine
+            values = np.array([int(v) if isinstance(v, float) and v.is_integer() else v for v in values], dtype=object)
+    if kind in ('integer', 'floating', 'mixed-integer-float'):
+        numbers = values.astype(np.float64)
+        # read_excel turns whole floats (calamine reads every number as one) into ints
+        if not missing.any() and (numbers == np.floor(numbers)).all():
+            return numbers.astype(np.int64)
+        return numbers
+    if kind == 'boolean' and not missing.any():
+        return values.astype(bool)
+    if kind in ('datetime', 'datetime64', 'date'):
+        return pd.to_datetime(pd.Series(values)).to_numpy()
+    if missing.any():
+        values = values.copy()
+        values[missing] = np.nan
+    return values